@@ -1,276 +1,3450 @@
-import tkinter as tk
-from tkinter import ttk, messagebox
-from ttkbootstrap import Style
-from PIL import Image, ImageTk
+from PIL import Image
 import cv2
 import face_recognition
+import dlib
 import numpy as np
 from datetime import datetime
 import threading
 import queue
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import multiprocessing
+from multiprocessing import shared_memory
 import io
+import gzip
 import os
+import sys
+import argparse
+import csv
+import json
+import signal
+import time
+import select
+import struct
+from contextlib import contextmanager
+from collections import OrderedDict, deque
 import psycopg2
 from psycopg2 import sql
-import mediapipe as mp
+from psycopg2 import pool as pg_pool
+from psycopg2.extras import execute_values
+try:
+    import mediapipe as mp
+except ImportError:
+    # Faqat --orientation mediapipe rejimi uchun kerak
+    mp = None
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+try:
+    import tkinter as tk
+    from tkinter import ttk, messagebox
+    from ttkbootstrap import Style
+    from PIL import ImageTk
+except ImportError:
+    # Faqat oynali rejim uchun kerak - --headless va paket rejimlari ularsiz ishlaydi
+    tk = ttk = messagebox = Style = ImageTk = None
+
+# LRU Cache
+class LRUCache:
+    """Oqimlar uchun xavfsiz, hajmi cheklangan LRU kesh"""
+
+    def __init__(self, maxsize=256, ttl=None):
+        self.maxsize = maxsize
+        # ttl (soniya) berilsa, eskirgan yozuvlar qaytarilmaydi
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, kalit, default=None):
+        with self._lock:
+            yozuv = self._data.get(kalit)
+            if yozuv is None:
+                return default
+            vaqt, qiymat = yozuv
+            if self.ttl is not None and time.monotonic() - vaqt > self.ttl:
+                del self._data[kalit]
+                return default
+            self._data.move_to_end(kalit)
+            return qiymat
+
+    def put(self, kalit, qiymat):
+        with self._lock:
+            self._data[kalit] = (time.monotonic(), qiymat)
+            self._data.move_to_end(kalit)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, kalit):
+        with self._lock:
+            yozuv = self._data.pop(kalit, None)
+            return yozuv[1] if yozuv is not None else None
+
+    def update(self, kalit, funksiya):
+        """Mavjud qiymatni funksiya(qiymat) natijasiga almashtirish (yo'q bo'lsa hech narsa qilmaydi)"""
+        with self._lock:
+            yozuv = self._data.get(kalit)
+            if yozuv is not None:
+                self._data[kalit] = (yozuv[0], funksiya(yozuv[1]))
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
 
 # Database Class
 class FaceDB:
-    def __init__(self, dbname, user, password, host, port):
+    # Shuncha soniyadan ko'p bo'sh turgan ulanish qayta ishlatishdan oldin tekshiriladi
+    SOGLIK_TEKSHIRUV_ORALIGI = 30
+    # Ro'yxat va ma'lumotlar paneli uchun kichik rasmning eng katta tomoni
+    THUMB_OLCHAMI = 300
+    # face_data o'zgarganda trigger shu kanalga NOTIFY yuboradi
+    OZGARISH_KANALI = "face_data_ozgarish"
+    # Yuz kodlarini saqlash formatlari va ularning ustunlari
+    KODLASH_FORMATLARI = {
+        "float_array": "encoding",
+        "bytea": "encoding_bin",
+        "pgvector": "encoding_vec",
+    }
+    # Yangi log qatorlari (yangi CTE si) bo'yicha oxirgi kirishni yangilash
+    OXIRGI_KIRISH_YANGILASH = """
+        INSERT INTO face_last_entry (face_id, last_entry)
+        SELECT id_name, MAX(entry_time) FROM yangi GROUP BY id_name
+        ON CONFLICT (face_id) DO UPDATE
+            SET last_entry = GREATEST(face_last_entry.last_entry, EXCLUDED.last_entry)
+    """
+
+    def __init__(self, dbname, user, password, host, port, min_ulanish=1, max_ulanish=8,
+                 kodlash_formati="float_array", log_bolimlash=False, log_saqlash_oylari=None,
+                 arxiv_papkasi=None):
+        if kodlash_formati not in self.KODLASH_FORMATLARI:
+            raise ValueError(f"Noma'lum kodlash formati: {kodlash_formati}")
         self.dbname = dbname
         self.user = user
         self.password = password
         self.host = host
         self.port = port
-        self.connection = None
+        self.min_ulanish = min_ulanish
+        self.max_ulanish = max_ulanish
+        self.kodlash_formati = kodlash_formati
+        # face_log_data oylik bo'limlarga ajratiladi; saqlash muddati o'tgan oylar
+        # arxiv papkasiga (berilgan bo'lsa) gzip CSV qilib yoziladi va o'chiriladi
+        self.log_bolimlash = log_bolimlash
+        self.log_saqlash_oylari = log_saqlash_oylari
+        self.arxiv_papkasi = arxiv_papkasi
+        self.thumb_cache = LRUCache(256)
+        # Ma'lumotlar paneli uchun: ism, familiya, vaqtlar va ochilgan kichik rasm
+        self.profil_cache = LRUCache(512, ttl=300)
+        self.pool = None
+        self._pool_lock = threading.Lock()
+        # Pul to'lganda xatolik o'rniga navbat kutish uchun
+        self._pool_semafor = threading.BoundedSemaphore(max_ulanish)
+        self._oxirgi_foydalanish = {}
 
     def ulanish(self):
+        """Ulanishlar pulini yaratish (faqat birinchi chaqiruvda)"""
+        if self.pool is not None and not self.pool.closed:
+            return True
+        with self._pool_lock:
+            if self.pool is not None and not self.pool.closed:
+                return True
+            try:
+                self.pool = pg_pool.ThreadedConnectionPool(
+                    self.min_ulanish,
+                    self.max_ulanish,
+                    dbname=self.dbname,
+                    user=self.user,
+                    password=self.password,
+                    host=self.host,
+                    port=self.port
+                )
+                self._oxirgi_foydalanish = {}
+                return True
+            except Exception as e:
+                print(f"Bazaga ulanib bolmadi: {e}")
+                self.pool = None
+                return False
+
+    def ulanishni_yopish(self):
+        """Puldagi barcha ulanishlarni yopish"""
+        with self._pool_lock:
+            if self.pool is not None and not self.pool.closed:
+                self.pool.closeall()
+            self.pool = None
+            self._oxirgi_foydalanish = {}
+
+    def _ulanish_sogmi(self, conn):
+        """Uzoq bo'sh turgan ulanishni SELECT 1 bilan tekshirish"""
+        if conn.closed:
+            return False
+        oxirgi = self._oxirgi_foydalanish.get(id(conn))
+        if oxirgi is not None and time.monotonic() - oxirgi < self.SOGLIK_TEKSHIRUV_ORALIGI:
+            return True
         try:
-            self.connection = psycopg2.connect(
-                dbname=self.dbname,
-                user=self.user,
-                password=self.password,
-                host=self.host,
-                port=self.port
-            )
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
             return True
-        except Exception as e:
-            print(f"Bazaga ulanib bolmadi: {e}")
+        except Exception:
             return False
 
-    def ulanishni_yopish(self):
-        if self.connection:
-            self.connection.close()
+    def _ulanishni_olish(self, pool):
+        """Puldan sog' ulanish olish, buzilganini yangisiga almashtirish"""
+        for _ in range(self.max_ulanish + 1):
+            conn = pool.getconn()
+            if self._ulanish_sogmi(conn):
+                return conn
+            self._ulanishni_qaytarish(pool, conn, buzilgan=True)
+        raise psycopg2.OperationalError("Sog' ulanish olib bo'lmadi")
+
+    def _ulanishni_qaytarish(self, pool, conn, buzilgan=False):
+        if pool.closed:
+            if not conn.closed:
+                conn.close()
+            return
+        if buzilgan or conn.closed:
+            self._oxirgi_foydalanish.pop(id(conn), None)
+            pool.putconn(conn, close=True)
+        else:
+            self._oxirgi_foydalanish[id(conn)] = time.monotonic()
+            pool.putconn(conn)
+
+    @contextmanager
+    def _kursor(self):
+        """Puldan ulanish olib kursor berish; oxirida commit yoki rollback"""
+        pool = self.pool if self.ulanish() else None
+        if pool is None:
+            raise psycopg2.OperationalError("Bazaga ulanib bolmadi")
+        self._pool_semafor.acquire()
+        conn = None
+        buzilgan = False
+        try:
+            conn = self._ulanishni_olish(pool)
+            with conn.cursor() as cursor:
+                yield cursor
+            conn.commit()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            buzilgan = True
+            raise
+        except Exception:
+            if conn is not None and not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            if conn is not None:
+                self._ulanishni_qaytarish(pool, conn, buzilgan)
+            self._pool_semafor.release()
 
     def jadvallarni_yaratish(self):
         if not self.ulanish():
             return False
         try:
-            cursor = self.connection.cursor()
+            with self._kursor() as cursor:
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS face_data (
+                        id SERIAL PRIMARY KEY,
+                        first_name VARCHAR(100),
+                        last_name VARCHAR(100),
+                        img BYTEA NOT NULL,
+                        encoding FLOAT[128] NOT NULL,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    );
+                """)
+                # Bo'limlash (--log-partitioning) alohida tranzaksiyada - pastga qarang
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS face_log_data (
+                        id SERIAL PRIMARY KEY,
+                        id_name INTEGER REFERENCES face_data(id),
+                        entry_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    );
+                """)
+                # Foydalanuvchi bo'yicha o'chirish va kirishlar tarixi uchun
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS face_log_data_id_name_entry_time_idx
+                    ON face_log_data (id_name, entry_time DESC)
+                """)
+                # Oxirgi kirish log yozuvchisi tomonidan yuritiladi - MAX(entry_time) kerak emas
+                cursor.execute("SELECT to_regclass('face_last_entry')")
+                mavjud = cursor.fetchone()[0] is not None
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS face_last_entry (
+                        face_id INTEGER PRIMARY KEY REFERENCES face_data(id) ON DELETE CASCADE,
+                        last_entry TIMESTAMP NOT NULL
+                    );
+                """)
+                if not mavjud:
+                    # Eski bazalar uchun bir martalik to'ldirish
+                    cursor.execute("""
+                        INSERT INTO face_last_entry (face_id, last_entry)
+                        SELECT id_name, MAX(entry_time) FROM face_log_data
+                        WHERE id_name IS NOT NULL AND entry_time IS NOT NULL
+                        GROUP BY id_name
+                        ON CONFLICT (face_id) DO NOTHING
+                    """)
+                # Kichik rasmlar to'liq rasmdan alohida saqlanadi
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS face_thumbnail (
+                        face_id INTEGER PRIMARY KEY REFERENCES face_data(id) ON DELETE CASCADE,
+                        thumb BYTEA NOT NULL
+                    );
+                """)
+                # Galereyani bosqichma-bosqich sinxronlash uchun o'zgarishlar ketma-ketligi
+                cursor.execute("CREATE SEQUENCE IF NOT EXISTS face_data_change_seq")
+                cursor.execute("""
+                    ALTER TABLE face_data
+                        ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        ADD COLUMN IF NOT EXISTS change_seq BIGINT NOT NULL DEFAULT nextval('face_data_change_seq'),
+                        ADD COLUMN IF NOT EXISTS change_txid BIGINT;
+                """)
+                cursor.execute("CREATE INDEX IF NOT EXISTS face_data_change_seq_idx ON face_data (change_seq)")
+                # change_seq commitdan oldin olinadi - kechroq commit qilingan tranzaksiya
+                # kichikroq raqam bilan kelishi mumkin, shuning uchun yozgan tranzaksiya ham saqlanadi
+                cursor.execute("CREATE INDEX IF NOT EXISTS face_data_change_txid_idx ON face_data (change_txid)")
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS face_data_deleted (
+                        id INTEGER PRIMARY KEY,
+                        change_seq BIGINT NOT NULL DEFAULT nextval('face_data_change_seq'),
+                        deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    );
+                """)
+                cursor.execute("ALTER TABLE face_data_deleted ADD COLUMN IF NOT EXISTS change_txid BIGINT")
+                cursor.execute("CREATE INDEX IF NOT EXISTS face_data_deleted_change_seq_idx ON face_data_deleted (change_seq)")
+                cursor.execute("CREATE INDEX IF NOT EXISTS face_data_deleted_change_txid_idx ON face_data_deleted (change_txid)")
+                cursor.execute(f"""
+                    CREATE OR REPLACE FUNCTION face_data_ozgarish() RETURNS trigger AS $$
+                    BEGIN
+                        IF TG_OP = 'DELETE' THEN
+                            INSERT INTO face_data_deleted (id, change_txid) VALUES (OLD.id, txid_current())
+                            ON CONFLICT (id) DO UPDATE
+                                SET change_seq = nextval('face_data_change_seq'), change_txid = txid_current(),
+                                    deleted_at = CURRENT_TIMESTAMP;
+                            PERFORM pg_notify('{self.OZGARISH_KANALI}', OLD.id::text);
+                            RETURN OLD;
+                        END IF;
+                        NEW.change_seq := nextval('face_data_change_seq');
+                        NEW.change_txid := txid_current();
+                        NEW.updated_at := CURRENT_TIMESTAMP;
+                        PERFORM pg_notify('{self.OZGARISH_KANALI}', NEW.id::text);
+                        RETURN NEW;
+                    END;
+                    $$ LANGUAGE plpgsql;
+                """)
+                cursor.execute("DROP TRIGGER IF EXISTS face_data_ozgarish_trg ON face_data")
+                cursor.execute("""
+                    CREATE TRIGGER face_data_ozgarish_trg
+                    BEFORE INSERT OR UPDATE OR DELETE ON face_data
+                    FOR EACH ROW EXECUTE PROCEDURE face_data_ozgarish();
+                """)
+            print("Jadvallar yaratildi.")
+        except Exception as e:
+            print(f"Xatolik: {e}")
+            return False
+        if self.log_bolimlash:
+            # Bo'limlashdagi xatolik asosiy sxemani qaytarib yubormasligi uchun alohida
+            try:
+                with self._kursor() as cursor:
+                    self._log_jadvalini_yaratish(cursor)
+            except Exception as e:
+                print(f"Log jadvalini bo'limlashda xatolik: {e}")
+            else:
+                self.log_bolimlarini_yuritish()
+        return self._kod_ustunini_yaratish()
+
+    def _log_jadvalini_yaratish(self, cursor):
+        """face_log_data ni entry_time bo'yicha oylik bo'limlanadigan jadval qilib yaratish
+
+        Oddiy (eski) jadval ko'chirilmaydi - u butunligicha hozirgi oygacha bo'lgan
+        davrni qamrovchi birinchi bo'lim sifatida ulanadi (bo'sh bo'lsa o'chiriladi).
+        """
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass('face_log_data')")
+        qator = cursor.fetchone()
+        if qator is not None and qator[0] == "p":
+            return
+        eski = False
+        if qator is not None:
+            cursor.execute("ALTER TABLE face_log_data RENAME TO face_log_data_eski")
             cursor.execute("""
-                CREATE TABLE IF NOT EXISTS face_data (
-                    id SERIAL PRIMARY KEY,
-                    first_name VARCHAR(100),
-                    last_name VARCHAR(100),
-                    img BYTEA NOT NULL,
-                    encoding FLOAT[128] NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
+                ALTER INDEX IF EXISTS face_log_data_id_name_entry_time_idx
+                RENAME TO face_log_data_eski_id_name_entry_time_idx
             """)
+            cursor.execute("SELECT EXISTS (SELECT 1 FROM face_log_data_eski)")
+            eski = cursor.fetchone()[0]
+            if not eski:
+                cursor.execute("DROP TABLE face_log_data_eski")
+        if eski:
+            # Bo'lim kaliti NULL bo'lolmaydi
+            cursor.execute("UPDATE face_log_data_eski SET entry_time = 'epoch' WHERE entry_time IS NULL")
+            # Ota jadval ustuni NOT NULL - aks holda ATTACH PARTITION rad etiladi
+            cursor.execute("ALTER TABLE face_log_data_eski ALTER COLUMN entry_time SET NOT NULL")
+            # Eski PRIMARY KEY (id) ota jadvalning (id, entry_time) kaliti bilan birga bo'lolmaydi;
+            # ulanganda ota kalitining indeksi bo'limda yaratiladi
             cursor.execute("""
-                CREATE TABLE IF NOT EXISTS face_log_data (
-                    id SERIAL PRIMARY KEY,
-                    id_name INTEGER REFERENCES face_data(id),
-                    entry_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
+                SELECT conname FROM pg_constraint
+                WHERE conrelid = 'face_log_data_eski'::regclass AND contype = 'p'
             """)
-            self.connection.commit()
-            print("Jadvallar yaratildi.")
+            for (nomi,) in cursor.fetchall():
+                cursor.execute(sql.SQL("ALTER TABLE face_log_data_eski DROP CONSTRAINT {}").format(sql.Identifier(nomi)))
+        cursor.execute("""
+            CREATE TABLE face_log_data (
+                id SERIAL,
+                id_name INTEGER REFERENCES face_data(id),
+                entry_time TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (id, entry_time)
+            ) PARTITION BY RANGE (entry_time)
+        """)
+        if eski:
+            cursor.execute("""
+                SELECT date_trunc('month', GREATEST(MAX(entry_time), LOCALTIMESTAMP)) + interval '1 month',
+                       COALESCE(MAX(id), 0) + 1
+                FROM face_log_data_eski
+            """)
+            chegara, keyingi_id = cursor.fetchone()
+            cursor.execute("SELECT setval(pg_get_serial_sequence('face_log_data', 'id'), %s, false)", (keyingi_id,))
+            cursor.execute(
+                "ALTER TABLE face_log_data ATTACH PARTITION face_log_data_eski FOR VALUES FROM (MINVALUE) TO (%s)",
+                (chegara,)
+            )
+        # Oylik bo'limlar yaratilmay qolgan davr yozuvlari yo'qolmasligi uchun
+        cursor.execute("CREATE TABLE IF NOT EXISTS face_log_data_default PARTITION OF face_log_data DEFAULT")
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS face_log_data_id_name_entry_time_idx
+            ON face_log_data (id_name, entry_time DESC)
+        """)
+
+    @staticmethod
+    def _oy_qoshish(sana, oylar):
+        yil, oy = divmod(sana.month - 1 + oylar, 12)
+        return sana.replace(year=sana.year + yil, month=oy + 1)
+
+    def _log_bolimlari(self, cursor):
+        """face_log_data bo'limlari: [(nomi, yuqori chegara yoki None)]"""
+        cursor.execute("""
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'face_log_data'::regclass
+        """)
+        bolimlar = []
+        for nomi, ifoda in cursor.fetchall():
+            oxiri = None
+            if " TO (" in ifoda:
+                qiymat = ifoda.rsplit(" TO (", 1)[1].strip("()' ")
+                if qiymat != "MAXVALUE":
+                    oxiri = datetime.fromisoformat(qiymat)
+            bolimlar.append((nomi, oxiri))
+        return bolimlar
+
+    def log_bolimlarini_yuritish(self, oldinga=3):
+        """Keyingi oylar uchun bo'limlar yaratish, saqlash muddati o'tganlarini arxivlash"""
+        if not self.log_bolimlash or not self.ulanish():
+            return False
+        joriy_oy = datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        try:
+            with self._kursor() as cursor:
+                bolimlar = self._log_bolimlari(cursor)
+                # Oxirgi bo'limdan davom etiladi - yaratilmay qolgan oylar ham to'ldiriladi
+                oxirlar = [oxiri for _, oxiri in bolimlar if oxiri is not None]
+                boshi = max(oxirlar) if oxirlar else joriy_oy
+                tugash = self._oy_qoshish(joriy_oy, oldinga + 1)
+                while boshi < tugash:
+                    oxiri = self._oy_qoshish(boshi, 1)
+                    self._log_bolimini_yaratish(cursor, f"face_log_data_y{boshi:%Y}m{boshi:%m}", boshi, oxiri)
+                    boshi = oxiri
+        except Exception as e:
+            print(f"Log bo'limlarini yaratishda xatolik: {e}")
+            return False
+
+        if self.log_saqlash_oylari:
+            chegara = self._oy_qoshish(joriy_oy, -self.log_saqlash_oylari)
+            for nomi, oxiri in bolimlar:
+                if oxiri is not None and oxiri <= chegara:
+                    self._log_bolimini_arxivlash(nomi)
+        return True
+
+    @staticmethod
+    def _log_bolimini_yaratish(cursor, nomi, boshi, oxiri):
+        """Oylik bo'lim: default bo'limga tushib qolgan shu oy yozuvlari unga ko'chiriladi
+
+        PARTITION OF default bo'limda shu oraliq qatorlari bo'lsa rad etiladi, shuning
+        uchun jadval alohida yaratilib, qatorlar ko'chirilgach ulanadi.
+        """
+        jadval = sql.Identifier(nomi)
+        cursor.execute(
+            sql.SQL("CREATE TABLE {} (LIKE face_log_data INCLUDING DEFAULTS INCLUDING CONSTRAINTS)").format(jadval)
+        )
+        cursor.execute(
+            sql.SQL("""
+                WITH kochgan AS (
+                    DELETE FROM face_log_data_default
+                    WHERE entry_time >= %s AND entry_time < %s
+                    RETURNING id, id_name, entry_time
+                )
+                INSERT INTO {} (id, id_name, entry_time) SELECT id, id_name, entry_time FROM kochgan
+            """).format(jadval),
+            (boshi, oxiri)
+        )
+        cursor.execute(
+            sql.SQL("ALTER TABLE face_log_data ATTACH PARTITION {} FOR VALUES FROM (%s) TO (%s)").format(jadval),
+            (boshi, oxiri)
+        )
+
+    def _log_bolimini_arxivlash(self, nomi):
+        """Bo'limni ajratib olish, arxiv papkasiga gzip CSV qilib yozish va o'chirish"""
+        jadval = sql.Identifier(nomi)
+        fayl = None
+        try:
+            with self._kursor() as cursor:
+                cursor.execute(sql.SQL("ALTER TABLE face_log_data DETACH PARTITION {}").format(jadval))
+                if self.arxiv_papkasi:
+                    os.makedirs(self.arxiv_papkasi, exist_ok=True)
+                    fayl = os.path.join(self.arxiv_papkasi, f"{nomi}.csv.gz")
+                    with gzip.open(fayl + ".tmp", "wb") as f:
+                        cursor.copy_expert(
+                            sql.SQL("COPY {} (id, id_name, entry_time) TO STDOUT WITH (FORMAT csv, HEADER)").format(jadval),
+                            f
+                        )
+                    os.replace(fayl + ".tmp", fayl)
+                cursor.execute(sql.SQL("DROP TABLE {}").format(jadval))
+            print(f"{nomi} bo'limi o'chirildi" + (f" ({fayl} ga arxivlandi)" if fayl else ""))
             return True
         except Exception as e:
-            print(f"Xatolik: {e}")
+            print(f"{nomi} bo'limini arxivlashda xatolik: {e}")
             return False
-        finally:
-            self.ulanishni_yopish()
+
+    def _kod_ustunini_yaratish(self, kochirish=True):
+        """Ixcham formatlar uchun (bytea/pgvector) alohida kod ustunini qo'shish va to'ldirish"""
+        if self.kodlash_formati == "float_array":
+            return True
+        try:
+            with self._kursor() as cursor:
+                if self.kodlash_formati == "pgvector":
+                    cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'vector'")
+                    if cursor.fetchone() is None:
+                        print("Ogohlantirish: pgvector topilmadi, bytea formatidan foydalaniladi")
+                        self.kodlash_formati = "bytea"
+                    else:
+                        cursor.execute("CREATE EXTENSION IF NOT EXISTS vector")
+                if self.kodlash_formati == "pgvector":
+                    cursor.execute("ALTER TABLE face_data ADD COLUMN IF NOT EXISTS encoding_vec vector(128)")
+                else:
+                    cursor.execute("ALTER TABLE face_data ADD COLUMN IF NOT EXISTS encoding_bin BYTEA")
+                # Yangi yozuvlar eski FLOAT[128] ustunini to'ldirmaydi
+                eski_ustun = self._eski_ustun_bormi(cursor)
+                if eski_ustun:
+                    cursor.execute("ALTER TABLE face_data ALTER COLUMN encoding DROP NOT NULL")
+        except Exception as e:
+            print(f"Kod ustunini yaratishda xatolik: {e}")
+            return False
+        # O'qish faqat ixcham ustundan - ko'chirilmagan yuzlar galereyadan tushib qolmasin
+        if eski_ustun and kochirish:
+            self.kodlashlarni_kochirish()
+        return True
+
+    @staticmethod
+    def _eski_ustun_bormi(cursor):
+        cursor.execute("""
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'face_data' AND column_name = 'encoding'
+        """)
+        return cursor.fetchone() is not None
+
+    def _kod_ifodasi(self):
+        """SELECT uchun kod ustuni ifodasi"""
+        if self.kodlash_formati == "pgvector":
+            # vector_send: 4 bayt sarlavha + 128 ta big-endian float4
+            return sql.SQL("vector_send(encoding_vec)")
+        return sql.Identifier(self.KODLASH_FORMATLARI[self.kodlash_formati])
+
+    def _kod_qiymati(self, yuz_kodi):
+        """Kodni tanlangan formatdagi SQL parametriga aylantirish"""
+        kod = np.asarray(yuz_kodi, dtype=np.float64).reshape(128)
+        if self.kodlash_formati == "bytea":
+            return kod.astype('<f4').tobytes()
+        if self.kodlash_formati == "pgvector":
+            return "[" + ",".join(repr(float(x)) for x in kod.astype(np.float32)) + "]"
+        return kod.tolist()
+
+    def _kod_joyi(self):
+        return sql.SQL("%s::vector" if self.kodlash_formati == "pgvector" else "%s")
+
+    def _kodlarni_ochish(self, qatorlar):
+        """(id, kod, ...) qatorlaridan id lar ro'yxati va (N, 128) float32 matritsa olish"""
+        qatorlar = [qator for qator in qatorlar if qator[1] is not None]
+        yuz_ids = [qator[0] for qator in qatorlar]
+        if self.kodlash_formati == "float_array":
+            yuz_kodlari = np.array([qator[1] for qator in qatorlar], dtype=np.float32)
+        elif self.kodlash_formati == "bytea":
+            # Butun paket uchun bitta np.frombuffer
+            yuz_kodlari = np.frombuffer(b"".join(qator[1] for qator in qatorlar), dtype='<f4')
+        else:
+            yuz_kodlari = np.frombuffer(b"".join(qator[1] for qator in qatorlar), dtype='>f4')
+            yuz_kodlari = yuz_kodlari.reshape(-1, 129)[:, 1:].astype(np.float32)
+        return yuz_ids, yuz_kodlari.reshape(-1, 128)
+
+    def kodlashlarni_kochirish(self, paket_hajmi=1000, eski_ustunni_ochirish=False):
+        """Mavjud FLOAT[128] kodlarni tanlangan ixcham formatga paketlab ko'chirish"""
+        if self.kodlash_formati == "float_array":
+            print("Ko'chirish uchun bytea yoki pgvector formatini tanlang")
+            return 0
+        if not self.ulanish() or not self._kod_ustunini_yaratish(kochirish=False):
+            return 0
+        ustun = sql.Identifier(self.KODLASH_FORMATLARI[self.kodlash_formati])
+        kochirildi = 0
+        try:
+            with self._kursor() as cursor:
+                if not self._eski_ustun_bormi(cursor):
+                    return 0
+            while True:
+                with self._kursor() as cursor:
+                    cursor.execute(
+                        sql.SQL("""
+                            SELECT id, encoding FROM face_data
+                            WHERE {} IS NULL AND encoding IS NOT NULL
+                            ORDER BY id LIMIT %s
+                        """).format(ustun),
+                        (paket_hajmi,)
+                    )
+                    qatorlar = cursor.fetchall()
+                    if not qatorlar:
+                        break
+                    execute_values(
+                        cursor,
+                        sql.SQL("""
+                            UPDATE face_data AS fd SET {} = v.kod{}
+                            FROM (VALUES %s) AS v(id, kod)
+                            WHERE fd.id = v.id
+                        """).format(
+                            ustun,
+                            sql.SQL("::vector" if self.kodlash_formati == "pgvector" else "")
+                        ).as_string(cursor),
+                        [(qator[0], self._kod_qiymati(qator[1])) for qator in qatorlar],
+                        page_size=paket_hajmi
+                    )
+                kochirildi += len(qatorlar)
+                print(f"{kochirildi} ta kod ko'chirildi...")
+            if eski_ustunni_ochirish:
+                with self._kursor() as cursor:
+                    cursor.execute("ALTER TABLE face_data DROP COLUMN IF EXISTS encoding")
+            return kochirildi
+        except Exception as e:
+            print(f"Kodlarni ko'chirishda xatolik: {e}")
+            return kochirildi
 
     def yuz_qoshish(self, yuz_rasmi, yuz_kodi):
         if not self.ulanish():
             return None
         try:
-            cursor = self.connection.cursor()
             _, buffer = cv2.imencode(".jpg", yuz_rasmi)
             io_buf = io.BytesIO(buffer)
-            kod_royxati = yuz_kodi.tolist()
-            cursor.execute(
-                sql.SQL("""
-                    INSERT INTO face_data (img, encoding, first_name, last_name)
-                    VALUES (%s, %s, %s, %s)
-                    RETURNING id
-                """),
-                (io_buf.read(), kod_royxati, "Aniqlanmagan!", "Aniqlanmagan!")
-            )
-            yuz_id = cursor.fetchone()[0]
-            cursor.execute(
-                sql.SQL("INSERT INTO face_log_data (id_name) VALUES (%s)"),
-                (yuz_id,)
-            )
-            self.connection.commit()
+            thumb = self._thumbnail_yaratish(yuz_rasmi)
+            with self._kursor() as cursor:
+                cursor.execute(
+                    sql.SQL("""
+                        INSERT INTO face_data (img, {}, first_name, last_name)
+                        VALUES (%s, {}, %s, %s)
+                        RETURNING id
+                    """).format(
+                        sql.Identifier(self.KODLASH_FORMATLARI[self.kodlash_formati]),
+                        self._kod_joyi()
+                    ),
+                    (io_buf.read(), self._kod_qiymati(yuz_kodi), "Aniqlanmagan!", "Aniqlanmagan!")
+                )
+                yuz_id = cursor.fetchone()[0]
+                if thumb is not None:
+                    cursor.execute(
+                        "INSERT INTO face_thumbnail (face_id, thumb) VALUES (%s, %s)",
+                        (yuz_id, thumb)
+                    )
+                cursor.execute(
+                    "WITH yangi AS (INSERT INTO face_log_data (id_name) VALUES (%s) RETURNING id_name, entry_time)"
+                    + self.OXIRGI_KIRISH_YANGILASH,
+                    (yuz_id,)
+                )
+            if thumb is not None:
+                self.thumb_cache.put(yuz_id, thumb)
             return yuz_id
         except Exception as e:
             print(f"Yuz qoshishda xatolik: {e}")
             return None
-        finally:
-            self.ulanishni_yopish()
 
 
-    def get_user_details(self, user_id):
-        """Foydalanuvchi ma'lumotlarini olish"""
-        if not self.ulanish():
+    @staticmethod
+    def _copy_matni(qiymat):
+        """COPY text formati uchun maxsus belgilarni ekranlash"""
+        return (str(qiymat).replace("\\", "\\\\").replace("\t", "\\t")
+                .replace("\n", "\\n").replace("\r", "\\r"))
+
+    def _kod_copy_qiymati(self, yuz_kodi):
+        """Kodni COPY text formatidagi ustun qiymatiga aylantirish"""
+        qiymat = self._kod_qiymati(yuz_kodi)
+        if self.kodlash_formati == "bytea":
+            return "\\\\x" + qiymat.hex()
+        if self.kodlash_formati == "pgvector":
+            return qiymat
+        return "{" + ",".join(repr(x) for x in qiymat) + "}"
+
+    def yuzlarni_kopiyalash(self, yozuvlar):
+        """Ko'p yuzni bitta COPY bilan qo'shish
+
+        yozuvlar: (jpeg_baytlar, kod, ism, familiya, thumb) ro'yxati (thumb None
+        bo'lishi mumkin). id lar ketma-ketlikdan oldindan olinadi, shuning uchun
+        yangi id lar tartib bo'yicha qaytariladi; xatolikda bo'sh ro'yxat.
+        """
+        if not yozuvlar or not self.ulanish():
+            return []
+        try:
+            with self._kursor() as cursor:
+                cursor.execute(
+                    "SELECT nextval(pg_get_serial_sequence('face_data', 'id')) FROM generate_series(1, %s)",
+                    (len(yozuvlar),)
+                )
+                yuz_ids = [qator[0] for qator in cursor.fetchall()]
+                buf = io.StringIO()
+                for yuz_id, (rasm, kod, ism, familiya, _) in zip(yuz_ids, yozuvlar):
+                    buf.write("\t".join((
+                        str(yuz_id),
+                        self._copy_matni(ism),
+                        self._copy_matni(familiya),
+                        "\\\\x" + bytes(rasm).hex(),
+                        self._kod_copy_qiymati(kod),
+                    )) + "\n")
+                buf.seek(0)
+                cursor.copy_expert(
+                    sql.SQL("COPY face_data (id, first_name, last_name, img, {}) FROM STDIN").format(
+                        sql.Identifier(self.KODLASH_FORMATLARI[self.kodlash_formati])
+                    ),
+                    buf
+                )
+                # Kichik rasmlar ham shu tranzaksiyada (yuz_qoshish dagi kabi)
+                buf = io.StringIO()
+                for yuz_id, yozuv in zip(yuz_ids, yozuvlar):
+                    if yozuv[4] is not None:
+                        buf.write(f"{yuz_id}\t\\\\x{bytes(yozuv[4]).hex()}\n")
+                buf.seek(0)
+                cursor.copy_expert("COPY face_thumbnail (face_id, thumb) FROM STDIN", buf)
+            return yuz_ids
+        except Exception as e:
+            print(f"Yuzlarni COPY bilan qo'shishda xatolik: {e}")
+            return []
+
+    def barcha_yuzlarni_olish(self):
+        """Barcha yuz id lari va (N, 128) float32 kodlar matritsasini olish"""
+        bosh = ([], np.empty((0, 128), dtype=np.float32))
+        if not self.ulanish():
+            return bosh
+        try:
+            with self._kursor() as cursor:
+                cursor.execute(
+                    sql.SQL("SELECT id, {} FROM face_data").format(self._kod_ifodasi())
+                )
+                qatorlar = cursor.fetchall()
+            return self._kodlarni_ochish(qatorlar)
+        except Exception as e:
+            print(f"Xatolik: {e}")
+            return bosh
+
+    def ozgarishlarni_olish(self, belgi=(0, None)):
+        """belgi = (change_seq, txid) dan keyingi yangilangan va o'chirilgan yuzlarni olish
+
+        change_seq > seq bo'lganlardan tashqari oldingi o'qishda hali tugamagan
+        tranzaksiyalar yozgan qatorlar (change_txid >= txid) ham qayta o'qiladi;
+        ular kichikroq change_seq bilan keyinroq commit qilingan bo'lishi mumkin.
+        """
+        if not self.ulanish():
+            return None
+        seq, txid = belgi
+        try:
+            with self._kursor() as cursor:
+                # O'qishlardan oldin olinadi: keyingi so'rovlarga ko'rinmagan har bir
+                # tranzaksiya raqami shundan katta yoki teng bo'ladi
+                cursor.execute("SELECT txid_snapshot_xmin(txid_current_snapshot())")
+                yangi_txid = cursor.fetchone()[0]
+                cursor.execute(
+                    sql.SQL("""
+                        SELECT id, {}, change_seq FROM face_data
+                        WHERE change_seq > %s OR change_txid >= %s
+                    """).format(self._kod_ifodasi()),
+                    (seq, txid)
+                )
+                qatorlar = cursor.fetchall()
+                cursor.execute(
+                    "SELECT id, change_seq FROM face_data_deleted WHERE change_seq > %s OR change_txid >= %s",
+                    (seq, txid)
+                )
+                ochirilganlar = cursor.fetchall()
+            yuz_ids, yuz_kodlari = self._kodlarni_ochish(qatorlar)
+            ochirilgan_ids = [qator[0] for qator in ochirilganlar]
+            yangi_seq = max([seq] + [qator[2] for qator in qatorlar] + [qator[1] for qator in ochirilganlar])
+            return yuz_ids, yuz_kodlari, ochirilgan_ids, (yangi_seq, yangi_txid)
+        except Exception as e:
+            print(f"O'zgarishlarni olishda xatolik: {e}")
+            return None
+
+    def joriy_belgi(self):
+        """face_data_change_seq ketma-ketligining oxirgi qiymati"""
+        if not self.ulanish():
+            return None
+        try:
+            with self._kursor() as cursor:
+                cursor.execute("SELECT last_value FROM face_data_change_seq")
+                return cursor.fetchone()[0]
+        except Exception as e:
+            print(f"Xatolik: {e}")
+            return None
+
+    def tinglovchi_ulanish(self):
+        """LISTEN uchun puldan tashqari alohida (autocommit) ulanish ochish"""
+        try:
+            conn = psycopg2.connect(
+                dbname=self.dbname,
+                user=self.user,
+                password=self.password,
+                host=self.host,
+                port=self.port
+            )
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {self.OZGARISH_KANALI}")
+            return conn
+        except Exception as e:
+            print(f"LISTEN ulanishini ochib bo'lmadi: {e}")
+            return None
+
+    def kirishlarni_loglash(self, yozuvlar):
+        """Bir nechta kirishni bitta ko'p qatorli INSERT bilan yozish"""
+        if not yozuvlar:
+            return True
+        if not self.ulanish():
+            return False
+        try:
+            with self._kursor() as cursor:
+                # O'chirilgan foydalanuvchilar yozuvi butun paketni buzmasligi uchun JOIN
+                execute_values(
+                    cursor,
+                    """
+                    WITH yangi AS (
+                        INSERT INTO face_log_data (id_name, entry_time)
+                        SELECT v.id_name, v.entry_time
+                        FROM (VALUES %s) AS v(id_name, entry_time)
+                        JOIN face_data fd ON fd.id = v.id_name
+                        RETURNING id_name, entry_time
+                    )
+                    """ + self.OXIRGI_KIRISH_YANGILASH,
+                    yozuvlar,
+                    page_size=len(yozuvlar)
+                )
+            for yuz_id, vaqt in yozuvlar:
+                self.profil_cache.update(
+                    yuz_id,
+                    lambda profil, vaqt=vaqt: dict(profil, last_entry=max(vaqt, profil['last_entry'] or vaqt))
+                )
+            return True
+        except Exception as e:
+            print(f"Log yozishda xatolik: {e}")
+            return False
+
+    def foydalanuvchilar_sahifasi(self, qidiruv="", oxirgi_id=None, hajm=200):
+        """Bitta sahifa foydalanuvchilar (id kamayish tartibida, keyset pagination)
+
+        oxirgi_id - oldingi sahifaning eng kichik id si; qidiruv ism/familiya
+        bo'yicha yoki raqam bo'lsa id bo'yicha bazaning o'zida filtrlanadi.
+        """
+        if not self.ulanish():
+            return []
+        shartlar = []
+        parametrlar = []
+        if oxirgi_id is not None:
+            shartlar.append(sql.SQL("fd.id < %s"))
+            parametrlar.append(oxirgi_id)
+        qidiruv = (qidiruv or "").strip()
+        if qidiruv:
+            namuna = "%" + qidiruv.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            filtr = sql.SQL("fd.first_name ILIKE %s OR fd.last_name ILIKE %s")
+            parametrlar += [namuna, namuna]
+            if qidiruv.isdigit():
+                filtr = sql.SQL("fd.id = %s OR ") + filtr
+                parametrlar.insert(len(parametrlar) - 2, int(qidiruv))
+            shartlar.append(sql.SQL("({})").format(filtr))
+        qayerda = sql.SQL("WHERE ") + sql.SQL(" AND ").join(shartlar) if shartlar else sql.SQL("")
+        parametrlar.append(hajm)
+        try:
+            with self._kursor() as cursor:
+                cursor.execute(sql.SQL("""
+                    SELECT
+                        fd.id,
+                        fd.first_name,
+                        fd.last_name,
+                        to_char(fd.created_at, 'YYYY-MM-DD HH24:MI:SS') as created_at,
+                        to_char(fl.last_entry, 'YYYY-MM-DD HH24:MI:SS') as last_entry
+                    FROM face_data fd
+                    LEFT JOIN face_last_entry fl ON fl.face_id = fd.id
+                    {}
+                    ORDER BY fd.id DESC
+                    LIMIT %s
+                """).format(qayerda), parametrlar)
+                return cursor.fetchall()
+        except Exception as e:
+            print(f"Xatolik: {e}")
+            return []
+
+    def update_user_info(self, user_id, ism, familiya):
+        """Foydalanuvchi ism va familiyasini yangilash"""
+        if not self.ulanish():
+            return False
+        try:
+            with self._kursor() as cursor:
+                cursor.execute(
+                    "UPDATE face_data SET first_name = %s, last_name = %s WHERE id = %s",
+                    (ism, familiya, user_id)
+                )
+            self.profil_cache.pop(user_id)
+            return True
+        except Exception as e:
+            print(f"Ma'lumotlarni yangilashda xatolik: {e}")
+            return False
+
+    def foydalanuvchini_ochirish(self, face_id):
+        if not self.ulanish():
+            return False
+        try:
+            with self._kursor() as cursor:
+                cursor.execute("DELETE FROM face_log_data WHERE id_name = %s", (face_id,))
+                cursor.execute("DELETE FROM face_data WHERE id = %s", (face_id,))
+            self.keshni_bekor_qilish(face_id)
+            return True
+        except Exception as e:
+            print(f"Xatolik: {e}")
+            return False
+
+    def keshni_bekor_qilish(self, face_id):
+        """Foydalanuvchining keshlangan profili va kichik rasmini o'chirish"""
+        self.profil_cache.pop(face_id)
+        self.thumb_cache.pop(face_id)
+
+    def get_user_profile(self, user_id):
+        """Ma'lumotlar paneli uchun profil (kesh orqali, bitta so'rov bilan)"""
+        profil = self.profil_cache.get(user_id)
+        if profil is not None:
+            return profil
+        if not self.ulanish():
+            return None
+        try:
+            with self._kursor() as cursor:
+                cursor.execute(
+                    """
+                    SELECT fd.first_name, fd.last_name, fd.created_at,
+                           fl.last_entry,
+                           ft.thumb
+                    FROM face_data fd
+                    LEFT JOIN face_last_entry fl ON fl.face_id = fd.id
+                    LEFT JOIN face_thumbnail ft ON ft.face_id = fd.id
+                    WHERE fd.id = %s
+                    """,
+                    (user_id,)
+                )
+                result = cursor.fetchone()
+            if not result:
+                return None
+            thumb = bytes(result[4]) if result[4] is not None else self.get_user_thumbnail(user_id)
+            rasm = None
+            if thumb:
+                try:
+                    rasm = Image.open(io.BytesIO(thumb))
+                    rasm.thumbnail((200, 200))
+                    rasm.load()
+                except Exception as e:
+                    print("Rasm yuklashda xatolik:", e)
+                    rasm = None
+            profil = {
+                'ism': result[0] or "Mavjud emas",
+                'familiya': result[1] or "Mavjud emas",
+                'created_at': result[2].strftime("%Y-%m-%d %H:%M:%S") if result[2] else "Mavjud emas",
+                'last_entry': result[3],
+                'rasm': rasm
+            }
+            self.profil_cache.put(user_id, profil)
+            return profil
+        except Exception as e:
+            print("Foydalanuvchi profilini olishda xatolik:", e)
+            return None
+
+    @classmethod
+    def _thumbnail_yaratish(cls, rasm):
+        """BGR rasmdan eng katta tomoni THUMB_OLCHAMI bo'lgan JPEG yaratish"""
+        if rasm is None or rasm.size == 0:
+            return None
+        h, w = rasm.shape[:2]
+        masshtab = cls.THUMB_OLCHAMI / max(h, w)
+        if masshtab < 1:
+            rasm = cv2.resize(rasm, (max(1, int(w * masshtab)), max(1, int(h * masshtab))),
+                              interpolation=cv2.INTER_AREA)
+        ok, buffer = cv2.imencode(".jpg", rasm, [cv2.IMWRITE_JPEG_QUALITY, 85])
+        return buffer.tobytes() if ok else None
+
+    def get_user_thumbnail(self, face_id):
+        """Kichik rasmni olish (LRU kesh orqali); yo'q bo'lsa to'liq rasmdan yaratib saqlash"""
+        thumb = self.thumb_cache.get(face_id)
+        if thumb is not None:
+            return thumb
+        if not self.ulanish():
+            return None
+        try:
+            with self._kursor() as cursor:
+                cursor.execute("SELECT thumb FROM face_thumbnail WHERE face_id = %s", (face_id,))
+                row = cursor.fetchone()
+                if row:
+                    thumb = bytes(row[0])
+                else:
+                    # Eski yozuvlar uchun bir marta yaratib qo'yish
+                    cursor.execute("SELECT img FROM face_data WHERE id = %s", (face_id,))
+                    row = cursor.fetchone()
+                    if not row:
+                        return None
+                    rasm = cv2.imdecode(np.frombuffer(row[0], dtype=np.uint8), cv2.IMREAD_COLOR)
+                    thumb = self._thumbnail_yaratish(rasm)
+                    if thumb is None:
+                        return None
+                    cursor.execute(
+                        """
+                        INSERT INTO face_thumbnail (face_id, thumb) VALUES (%s, %s)
+                        ON CONFLICT (face_id) DO NOTHING
+                        """,
+                        (face_id, thumb)
+                    )
+            self.thumb_cache.put(face_id, thumb)
+            return thumb
+        except Exception as e:
+            print(f"Kichik rasmni olishda xatolik: {e}")
+            return None
+
+# Entry Log Writer
+class EntryLogWriter:
+    """Kirish loglarini fon oqimida to'plab, paketlar bilan bazaga yozish"""
+    _TOXTASH = object()
+
+    def __init__(self, face_db, paket_hajmi=200, flush_oraligi=1.0, navbat_hajmi=10000, kutish_vaqti=0.05,
+                 xizmat_oraligi=3600):
+        self.face_db = face_db
+        self.paket_hajmi = paket_hajmi
+        self.flush_oraligi = flush_oraligi
+        # Bo'limlangan log jadvali uchun yangi oylar/saqlash muddati shu oraliqda tekshiriladi
+        self.xizmat_oraligi = xizmat_oraligi
+        self.kutish_vaqti = kutish_vaqti
+        self.navbat = queue.Queue(maxsize=navbat_hajmi)
+        self.tashlanganlar = 0
+        # To'xtaganda bazaga yozilmay qolgan yozuvlar soni
+        self.yozilmay_qolgan = 0
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._ishlash, daemon=True)
+        self._thread.start()
+
+    def log(self, yuz_id, vaqt=None):
+        """Kirishni navbatga qo'yish; navbat to'lsa qisqa kutib, keyin tashlab yuborish"""
+        try:
+            self.navbat.put((yuz_id, vaqt or datetime.now()), timeout=self.kutish_vaqti)
+            return True
+        except queue.Full:
+            self.tashlanganlar += 1
+            print(f"Log navbati to'lgan, yozuv tashlab yuborildi (jami: {self.tashlanganlar})")
+            return False
+
+    def flush(self, timeout=2.0):
+        """Navbatdagi barcha yozuvlarni darhol bazaga yozish; yozilmasa False"""
+        if self._thread is None or not self._thread.is_alive():
+            return False
+        tayyor = threading.Event()
+        tayyor.yozildi = False
+        tugash = time.monotonic() + timeout
+        try:
+            # Navbat to'la bo'lsa ham chaqiruvchi timeout dan ortiq kutmaydi
+            self.navbat.put(tayyor, timeout=timeout)
+        except queue.Full:
+            return False
+        return tayyor.wait(max(0.0, tugash - time.monotonic())) and tayyor.yozildi
+
+    def stop(self, timeout=5.0):
+        """Qolgan yozuvlarni yozib, oqimni to'xtatish; hammasi yozilgan bo'lsa True"""
+        if self._thread is None or not self._thread.is_alive():
+            return self.yozilmay_qolgan == 0
+        tugash = time.monotonic() + timeout
+        try:
+            self.navbat.put(self._TOXTASH, timeout=timeout)
+        except queue.Full:
+            # Oqim hali ishlayapti - keyinroq stop() qayta chaqirilishi mumkin
+            return False
+        self._thread.join(max(0.0, tugash - time.monotonic()))
+        toxtadi = not self._thread.is_alive()
+        self._thread = None
+        return toxtadi and self.yozilmay_qolgan == 0
+
+    def _ishlash(self):
+        paket = []
+        muddat = 0.0
+        keyingi_xizmat = time.monotonic() + self.xizmat_oraligi
+        toxtash = False
+        while not toxtash:
+            muddatlar = [keyingi_xizmat] if self.face_db.log_bolimlash else []
+            if paket:
+                muddatlar.append(muddat)
+            kutish = max(0.0, min(muddatlar) - time.monotonic()) if muddatlar else None
+            try:
+                elementlar = [self.navbat.get(timeout=kutish)]
+            except queue.Empty:
+                elementlar = []
+
+            # Navbatda turgan yozuvlarni ham birdaniga olish
+            while elementlar and len(paket) + len(elementlar) < self.paket_hajmi:
+                try:
+                    elementlar.append(self.navbat.get_nowait())
+                except queue.Empty:
+                    break
+
+            flush_sorovlari = []
+            for element in elementlar:
+                if element is self._TOXTASH:
+                    toxtash = True
+                elif isinstance(element, threading.Event):
+                    flush_sorovlari.append(element)
+                else:
+                    if not paket:
+                        muddat = time.monotonic() + self.flush_oraligi
+                    paket.append(element)
+
+            if paket and (toxtash or flush_sorovlari or len(paket) >= self.paket_hajmi
+                          or time.monotonic() >= muddat):
+                try:
+                    yozildi = self.face_db.kirishlarni_loglash(paket)
+                except Exception as e:
+                    print(f"Log yozishda xatolik: {e}")
+                    yozildi = False
+                if yozildi:
+                    paket = []
+                else:
+                    # Baza vaqtincha ishlamasa, keyinroq qayta urinish
+                    if len(paket) > self.navbat.maxsize:
+                        self.tashlanganlar += len(paket) - self.navbat.maxsize
+                        paket = paket[-self.navbat.maxsize:]
+                    muddat = time.monotonic() + self.flush_oraligi
+
+            # Paket yozilmagan bo'lsa u saqlanib qoladi, kutayotganlar esa False oladi
+            for tayyor in flush_sorovlari:
+                tayyor.yozildi = not paket
+                tayyor.set()
+
+            if self.face_db.log_bolimlash and time.monotonic() >= keyingi_xizmat:
+                self.face_db.log_bolimlarini_yuritish()
+                keyingi_xizmat = time.monotonic() + self.xizmat_oraligi
+
+        self.yozilmay_qolgan = len(paket)
+        if paket:
+            print(f"{len(paket)} ta log yozuvi bazaga yozilmay qoldi")
+
+# Approximate Nearest Neighbour Search
+class IVFIndex:
+    """Inverted-file (IVF) taqribiy qidiruv: k-means markazlari bo'yicha ro'yxatlar (sof NumPy)"""
+
+    def __init__(self, dim=128, nprobe=8, nlist=None, iteratsiyalar=10, namuna_hajmi=20000):
+        self.dim = dim
+        # nprobe - tekshiriladigan ro'yxatlar soni: katta qiymat aniqroq, lekin sekinroq
+        self.nprobe = nprobe
+        self.nlist = nlist
+        self.iteratsiyalar = iteratsiyalar
+        self.namuna_hajmi = namuna_hajmi
+        self._markazlar = None
+        self._kodlar = None
+        self._normalar = None
+        self._idlar = None
+        self._chegaralar = None
+
+    def __len__(self):
+        return 0 if self._idlar is None else len(self._idlar)
+
+    @staticmethod
+    def _eng_yaqin_markaz(kodlar, markazlar, qism=8192):
+        markaz_normalari = np.einsum('ij,ij->i', markazlar, markazlar)
+        natija = np.empty(len(kodlar), dtype=np.int64)
+        for i in range(0, len(kodlar), qism):
+            blok = kodlar[i:i + qism]
+            natija[i:i + qism] = np.argmin(markaz_normalari[None, :] - 2.0 * (blok @ markazlar.T), axis=1)
+        return natija
+
+    def _kmeans(self, namuna, k, rng):
+        markazlar = namuna[rng.choice(len(namuna), k, replace=False)].copy()
+        for _ in range(self.iteratsiyalar):
+            belgilar = self._eng_yaqin_markaz(namuna, markazlar)
+            sonlar = np.bincount(belgilar, minlength=k)
+            yigindi = np.zeros_like(markazlar)
+            np.add.at(yigindi, belgilar, namuna)
+            bosh = sonlar == 0
+            markazlar[~bosh] = yigindi[~bosh] / sonlar[~bosh, None]
+            # Bo'sh qolgan klasterlarni tasodifiy nuqtalar bilan qayta boshlash
+            if bosh.any():
+                markazlar[bosh] = namuna[rng.choice(len(namuna), int(bosh.sum()), replace=False)]
+        return markazlar
+
+    def build(self, yuz_ids, yuz_kodlari):
+        kodlar = np.ascontiguousarray(yuz_kodlari, dtype=np.float32).reshape(-1, self.dim)
+        idlar = np.asarray(yuz_ids, dtype=np.int64)
+        n = len(kodlar)
+        nlist = min(n, self.nlist or max(1, int(2 * np.sqrt(n))))
+        rng = np.random.default_rng(0)
+        namuna = kodlar if n <= self.namuna_hajmi else kodlar[rng.choice(n, self.namuna_hajmi, replace=False)]
+        self._markazlar = self._kmeans(namuna, nlist, rng)
+        belgilar = self._eng_yaqin_markaz(kodlar, self._markazlar)
+        tartib = np.argsort(belgilar, kind='stable')
+        # Har bir ro'yxat xotirada uzluksiz bo'lishi uchun klaster bo'yicha saralash
+        self._kodlar = kodlar[tartib]
+        self._normalar = np.einsum('ij,ij->i', self._kodlar, self._kodlar)
+        self._idlar = idlar[tartib]
+        self._chegaralar = np.searchsorted(belgilar[tartib], np.arange(nlist + 1))
+
+    def search(self, sorovlar, k=1):
+        sorovlar = np.asarray(sorovlar, dtype=np.float32).reshape(-1, self.dim)
+        m = len(sorovlar)
+        natija_idlar = np.full((m, k), -1, dtype=np.int64)
+        natija_masofalar = np.full((m, k), np.inf)
+        if self._idlar is None or len(self._idlar) == 0:
+            return natija_idlar, natija_masofalar
+        nprobe = min(self.nprobe, len(self._markazlar))
+        markaz_masofalari = np.einsum('ij,ij->i', self._markazlar, self._markazlar)[None, :] \
+            - 2.0 * (sorovlar @ self._markazlar.T)
+        for j in range(m):
+            royxatlar = np.argpartition(markaz_masofalari[j], nprobe - 1)[:nprobe]
+            qatorlar = np.concatenate([
+                np.arange(self._chegaralar[r], self._chegaralar[r + 1]) for r in royxatlar
+            ])
+            if len(qatorlar) == 0:
+                continue
+            masofa2 = self._normalar[qatorlar] - 2.0 * (self._kodlar[qatorlar] @ sorovlar[j])
+            kk = min(k, len(qatorlar))
+            eng_yaqin = np.argpartition(masofa2, kk - 1)[:kk]
+            eng_yaqin = eng_yaqin[np.argsort(masofa2[eng_yaqin])]
+            farq = self._kodlar[qatorlar[eng_yaqin]].astype(np.float64) - sorovlar[j]
+            natija_idlar[j, :kk] = self._idlar[qatorlar[eng_yaqin]]
+            natija_masofalar[j, :kk] = np.sqrt(np.einsum('ij,ij->i', farq, farq))
+        return natija_idlar, natija_masofalar
+
+
+class HNSWIndex:
+    """hnswlib (ixtiyoriy kutubxona) asosidagi HNSW graf qidiruvi"""
+
+    def __init__(self, dim=128, ef_search=64, M=16, ef_construction=200):
+        if hnswlib is None:
+            raise RuntimeError("hnswlib o'rnatilmagan")
+        self.dim = dim
+        # ef_search - qidiruvdagi nomzodlar ro'yxati: katta qiymat aniqroq, lekin sekinroq
+        self.ef_search = ef_search
+        self.M = M
+        self.ef_construction = ef_construction
+        self._index = None
+
+    def __len__(self):
+        return 0 if self._index is None else self._index.get_current_count()
+
+    def build(self, yuz_ids, yuz_kodlari):
+        kodlar = np.ascontiguousarray(yuz_kodlari, dtype=np.float32).reshape(-1, self.dim)
+        index = hnswlib.Index(space='l2', dim=self.dim)
+        index.init_index(max_elements=max(len(kodlar), 1), ef_construction=self.ef_construction, M=self.M)
+        index.add_items(kodlar, np.asarray(yuz_ids, dtype=np.int64))
+        index.set_ef(self.ef_search)
+        self._index = index
+
+    def search(self, sorovlar, k=1):
+        sorovlar = np.asarray(sorovlar, dtype=np.float32).reshape(-1, self.dim)
+        m = len(sorovlar)
+        natija_idlar = np.full((m, k), -1, dtype=np.int64)
+        natija_masofalar = np.full((m, k), np.inf)
+        kk = min(k, len(self))
+        if kk == 0 or m == 0:
+            return natija_idlar, natija_masofalar
+        self._index.set_ef(max(self.ef_search, kk))
+        belgilar, masofa2 = self._index.knn_query(sorovlar, k=kk)
+        natija_idlar[:, :kk] = belgilar
+        # hnswlib 'l2' kvadrat masofa qaytaradi
+        natija_masofalar[:, :kk] = np.sqrt(np.maximum(masofa2, 0))
+        return natija_idlar, natija_masofalar
+
+# Face Gallery Index
+class GalleryIndex:
+    """Yuz kodlarini uzluksiz float32 matritsada saqlash va tez qidirish"""
+    QIDIRUV_REJIMLARI = ("exact", "ivf", "hnsw", "auto")
+
+    def __init__(self, dim=128, sigim=1024, search_mode="exact", ann_min_hajm=20000,
+                 nprobe=8, ef_search=64):
+        if search_mode not in self.QIDIRUV_REJIMLARI:
+            raise ValueError(f"Noma'lum qidiruv rejimi: {search_mode}")
+        if search_mode == "hnsw" and hnswlib is None:
+            print("Ogohlantirish: hnswlib topilmadi, IVF qidiruvdan foydalaniladi")
+            search_mode = "ivf"
+        self.dim = dim
+        self.search_mode = search_mode
+        # Bundan kichik galereyalarda har doim aniq (to'liq) qidiruv
+        self.ann_min_hajm = ann_min_hajm
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self._lock = threading.RLock()
+        self._matritsa = np.empty((sigim, dim), dtype=np.float32)
+        self._normalar = np.empty(sigim, dtype=np.float32)
+        self._idlar = np.empty(sigim, dtype=np.int64)
+        self._qator = {}
+        self._soni = 0
+        self._mmap_bogliq = False
+        # ANN holati: qurilgan indeks + undan keyin qo'shilganlar (delta) + o'chirilganlar
+        self._ann = None
+        self._ann_idlar = set()
+        self._ann_delta = None
+        self._ann_ochirilgan = set()
+        self._ann_jurnal = None
+        self._ann_qurilmoqda = False
+        self._avlod = 0
+
+    def __len__(self):
+        return self._soni
+
+    def __contains__(self, yuz_id):
+        return yuz_id in self._qator
+
+    @property
+    def idlar(self):
+        with self._lock:
+            return self._idlar[:self._soni].copy()
+
+    def _sigimni_oshirish(self, kerak):
+        sigim = len(self._idlar)
+        if kerak <= sigim:
+            return
+        while sigim < kerak:
+            sigim *= 2
+        matritsa = np.empty((sigim, self.dim), dtype=np.float32)
+        normalar = np.empty(sigim, dtype=np.float32)
+        idlar = np.empty(sigim, dtype=np.int64)
+        matritsa[:self._soni] = self._matritsa[:self._soni]
+        normalar[:self._soni] = self._normalar[:self._soni]
+        idlar[:self._soni] = self._idlar[:self._soni]
+        self._matritsa, self._normalar, self._idlar = matritsa, normalar, idlar
+        self._mmap_bogliq = False
+
+    def reset(self, yuz_ids, yuz_kodlari, nusxa=True):
+        """Galereyani to'liq yangi ma'lumotlar bilan almashtirish
+
+        nusxa=False bo'lsa kodlar massivi (masalan, mmap) nusxalanmasdan
+        ishlatiladi; birinchi kengayishda xotiraga ko'chiriladi.
+        """
+        kodlar = np.asarray(yuz_kodlari, dtype=np.float32).reshape(-1, self.dim)
+        with self._lock:
+            n = len(kodlar)
+            if nusxa or n == 0:
+                sigim = max(1024, 1 << max(n - 1, 0).bit_length())
+                self._matritsa = np.empty((sigim, self.dim), dtype=np.float32)
+                self._matritsa[:n] = kodlar
+            else:
+                sigim = n
+                self._matritsa = kodlar
+            self._mmap_bogliq = not nusxa and n > 0
+            self._normalar = np.empty(sigim, dtype=np.float32)
+            self._idlar = np.empty(sigim, dtype=np.int64)
+            self._normalar[:n] = np.einsum('ij,ij->i', kodlar, kodlar)
+            self._idlar[:n] = yuz_ids
+            self._qator = {int(yuz_id): i for i, yuz_id in enumerate(self._idlar[:n])}
+            self._soni = n
+            self._ann_tozalash()
+
+    def snapshot(self):
+        """Joriy id lar va kodlarning nusxasini olish"""
+        with self._lock:
+            return self._idlar[:self._soni].copy(), self._matritsa[:self._soni].copy()
+
+    def detach_mmap(self):
+        """Kodlar fayl bilan bog'langan (mmap) bo'lsa, ularni xotiraga ko'chirish"""
+        with self._lock:
+            if self._mmap_bogliq:
+                self._matritsa = np.array(self._matritsa)
+                self._mmap_bogliq = False
+
+    def add(self, yuz_id, yuz_kodi):
+        """Yangi yuz qo'shish yoki mavjudini yangilash (amortizatsiyalangan O(1))"""
+        kod = np.asarray(yuz_kodi, dtype=np.float32).reshape(self.dim)
+        with self._lock:
+            i = self._qator.get(yuz_id)
+            if i is None:
+                self._sigimni_oshirish(self._soni + 1)
+                i = self._soni
+                self._soni += 1
+                self._qator[yuz_id] = i
+                self._idlar[i] = yuz_id
+            self._matritsa[i] = kod
+            self._normalar[i] = kod @ kod
+            self._ann_qayd('+', yuz_id, kod)
+
+    def remove(self, yuz_id):
+        """Yuzni o'chirish: oxirgi qatorni bo'shagan joyga ko'chirish (O(1))"""
+        with self._lock:
+            i = self._qator.pop(yuz_id, None)
+            if i is None:
+                return False
+            oxirgi = self._soni - 1
+            if i != oxirgi:
+                self._matritsa[i] = self._matritsa[oxirgi]
+                self._normalar[i] = self._normalar[oxirgi]
+                self._idlar[i] = self._idlar[oxirgi]
+                self._qator[int(self._idlar[i])] = i
+            self._soni = oxirgi
+            self._ann_qayd('-', yuz_id, None)
+            return True
+
+    def _aniq_qidiruv(self, sorovlar):
+        n = self._soni
+        m = len(sorovlar)
+        if n == 0 or m == 0:
+            return np.full(m, -1, dtype=np.int64), np.full(m, np.inf)
+        matritsa = self._matritsa[:n]
+        # |x - q|^2 = |x|^2 - 2 x.q + |q|^2  (bitta BLAS matritsa ko'paytmasi)
+        masofa2 = self._normalar[:n, None] - 2.0 * (matritsa @ sorovlar.T)
+        eng_yaqin = np.argmin(masofa2, axis=0)
+        idlar = self._idlar[eng_yaqin].copy()
+        # Chegaraviy holatlar uchun aniq masofani float64 da qayta hisoblash
+        farq = matritsa[eng_yaqin].astype(np.float64) - sorovlar
+        masofalar = np.sqrt(np.einsum('ij,ij->i', farq, farq))
+        return idlar, masofalar
+
+    def _ann_qidiruv(self, sorovlar):
+        # O'chirilgan yozuvlar natijani egallab qolmasligi uchun ko'proq qo'shni so'raymiz
+        k = 1 + min(len(self._ann_ochirilgan), 15)
+        ann_idlar, ann_masofalar = self._ann.search(sorovlar, k)
+        idlar, masofalar = self._ann_delta._aniq_qidiruv(sorovlar)
+        for j in range(len(sorovlar)):
+            for yuz_id, masofa in zip(ann_idlar[j], ann_masofalar[j]):
+                if yuz_id < 0 or yuz_id in self._ann_ochirilgan:
+                    continue
+                if masofa < masofalar[j]:
+                    idlar[j], masofalar[j] = yuz_id, masofa
+                break
+            else:
+                # Barcha nomzodlar o'chirilgan - shu so'rov uchun aniq qidiruv
+                idlar[j:j + 1], masofalar[j:j + 1] = self._aniq_qidiruv(sorovlar[j:j + 1])
+        return idlar, masofalar
+
+    def search(self, yuz_kodlari):
+        """Har bir kod uchun eng yaqin yuz id si va masofasini topish"""
+        sorovlar = np.asarray(yuz_kodlari, dtype=np.float32).reshape(-1, self.dim)
+        with self._lock:
+            if self._ann is not None and self._soni >= self.ann_min_hajm:
+                natija = self._ann_qidiruv(sorovlar)
+            else:
+                natija = self._aniq_qidiruv(sorovlar)
+            self._ann_tekshirish()
+        return natija
+
+    def match(self, yuz_kodi, tolerance=0.5):
+        """Bitta kodni galereyadan qidirish; mos kelmasa (None, masofa)"""
+        idlar, masofalar = self.search(yuz_kodi)
+        if masofalar[0] < tolerance:
+            return int(idlar[0]), float(masofalar[0])
+        return None, float(masofalar[0])
+
+    def _ann_tozalash(self):
+        self._ann = None
+        self._ann_idlar = set()
+        self._ann_delta = None
+        self._ann_ochirilgan = set()
+        self._ann_jurnal = None
+        self._avlod += 1
+
+    def _ann_qayd(self, amal, yuz_id, kod):
+        """Qo'shish/o'chirishni qurilgan ANN indeksi va fon qurilishi jurnaliga yozish"""
+        if self._ann_jurnal is not None:
+            self._ann_jurnal.append((amal, yuz_id, kod))
+        if self._ann is None:
+            return
+        if yuz_id in self._ann_idlar:
+            self._ann_ochirilgan.add(yuz_id)
+        if amal == '+':
+            self._ann_delta.add(yuz_id, kod)
+        else:
+            self._ann_delta.remove(yuz_id)
+
+    def _ann_tekshirish(self):
+        """Kerak bo'lsa ANN indeksini fon oqimida qayta qurishni boshlash"""
+        if self.search_mode == "exact" or self._ann_qurilmoqda:
+            return
+        if self._soni < self.ann_min_hajm:
+            return
+        if self._ann is not None:
+            ozgarishlar = len(self._ann_delta) + len(self._ann_ochirilgan)
+            if ozgarishlar <= 0.1 * len(self._ann_idlar):
+                return
+        self.rebuild_ann(background=True)
+
+    def _ann_yaratish(self):
+        if self.search_mode == "hnsw" or (self.search_mode == "auto" and hnswlib is not None):
+            return HNSWIndex(self.dim, ef_search=self.ef_search)
+        return IVFIndex(self.dim, nprobe=self.nprobe)
+
+    def rebuild_ann(self, background=True):
+        """ANN indeksini joriy galereya nusxasidan qurish"""
+        with self._lock:
+            if self._ann_qurilmoqda:
+                return
+            self._ann_qurilmoqda = True
+            n = self._soni
+            idlar = self._idlar[:n].copy()
+            kodlar = self._matritsa[:n].copy()
+            avlod = self._avlod
+            self._ann_jurnal = []
+        if background:
+            threading.Thread(target=self._ann_qurish, args=(idlar, kodlar, avlod), daemon=True).start()
+        else:
+            self._ann_qurish(idlar, kodlar, avlod)
+
+    def _ann_qurish(self, idlar, kodlar, avlod):
+        try:
+            ann = self._ann_yaratish()
+            ann.build(idlar, kodlar)
+        except Exception as e:
+            print(f"ANN indeksini qurishda xatolik: {e}")
+            ann = None
+        with self._lock:
+            self._ann_qurilmoqda = False
+            jurnal, self._ann_jurnal = self._ann_jurnal, None
+            if ann is None or avlod != self._avlod:
+                return
+            self._ann = ann
+            self._ann_idlar = set(idlar.tolist())
+            self._ann_delta = GalleryIndex(self.dim, sigim=64)
+            self._ann_ochirilgan = set()
+            # Qurilish davomida bo'lgan o'zgarishlarni yangi indeksga qo'llash
+            for amal, yuz_id, kod in jurnal:
+                self._ann_qayd(amal, yuz_id, kod)
+
+# Encoding Cache
+class EncodingCache:
+    """Galereyani diskda bitta binar faylda saqlash va mmap orqali nusxasiz yuklash"""
+    # Sarlavha: magic, versiya, o'lcham, soni, belgi (change_seq, txid) - 64 baytgacha to'ldiriladi
+    SARLAVHA = struct.Struct('<8sIIQqq')
+    SARLAVHA_HAJMI = 64
+    MAGIC = b'FACEGAL\x00'
+    VERSIYA = 2
+
+    def __init__(self, fayl_yoli=os.path.join('assets', 'gallery_cache.bin'), dim=128):
+        self.fayl_yoli = fayl_yoli
+        self.dim = dim
+
+    def load(self):
+        """(idlar, kodlar, belgi) qaytarish; kodlar copy-on-write mmap bo'ladi"""
+        try:
+            with open(self.fayl_yoli, 'rb') as f:
+                magic, versiya, dim, soni, seq, txid = self.SARLAVHA.unpack(f.read(self.SARLAVHA.size))
+            belgi = (seq, txid)
+            kutilgan_hajm = self.SARLAVHA_HAJMI + soni * 8 + soni * dim * 4
+            if (magic != self.MAGIC or versiya != self.VERSIYA or dim != self.dim
+                    or os.path.getsize(self.fayl_yoli) != kutilgan_hajm):
+                print("Kesh fayli eskirgan yoki buzilgan, e'tiborsiz qoldirildi")
+                return None
+            if soni == 0:
+                return [], np.empty((0, dim), dtype=np.float32), belgi
+            idlar = np.memmap(self.fayl_yoli, dtype='<i8', mode='r',
+                              offset=self.SARLAVHA_HAJMI, shape=(soni,))
+            kodlar = np.memmap(self.fayl_yoli, dtype='<f4', mode='c',
+                               offset=self.SARLAVHA_HAJMI + soni * 8, shape=(soni, dim))
+            return idlar, kodlar, belgi
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Keshni o'qishda xatolik: {e}")
+            return None
+
+    def save(self, yuz_ids, yuz_kodlari, belgi):
+        """Vaqtinchalik faylga yozib, keyin atomik almashtirish"""
+        idlar = np.ascontiguousarray(yuz_ids, dtype='<i8')
+        kodlar = np.ascontiguousarray(yuz_kodlari, dtype='<f4').reshape(-1, self.dim)
+        vaqtinchalik = self.fayl_yoli + '.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.fayl_yoli) or '.', exist_ok=True)
+            with open(vaqtinchalik, 'wb') as f:
+                seq, txid = belgi
+                sarlavha = self.SARLAVHA.pack(self.MAGIC, self.VERSIYA, self.dim, len(idlar), seq, txid or 0)
+                f.write(sarlavha.ljust(self.SARLAVHA_HAJMI, b'\x00'))
+                f.write(idlar.tobytes())
+                f.write(kodlar.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(vaqtinchalik, self.fayl_yoli)
+            return True
+        except Exception as e:
+            print(f"Keshni saqlashda xatolik: {e}")
+            return False
+
+# Gallery Sync
+class GallerySync:
+    """Xotiradagi galereyani bazadagi o'zgarishlar bilan bosqichma-bosqich sinxronlash"""
+
+    def __init__(self, face_db, gallery, oraliq=5.0, cache=None):
+        self.face_db = face_db
+        self.gallery = gallery
+        self.cache = cache
+        # NOTIFY kelmasa ham shuncha soniyada bir marta tekshiriladi
+        self.oraliq = oraliq
+        # (change_seq, txid) - ozgarishlarni_olish ga qarang
+        self.belgi = (0, None)
+        self._yuklangan = False
+        self._lock = threading.Lock()
+        self._toxtash = threading.Event()
+        self._thread = None
+
+    def _keshdan_yuklash(self):
+        """Disk keshini mmap qilib galereyaga yuklash; baza bilan mos kelmasa rad etish"""
+        natija = self.cache.load()
+        if natija is None:
+            return False
+        yuz_ids, yuz_kodlari, belgi = natija
+        joriy = self.face_db.joriy_belgi()
+        if joriy is None or joriy < belgi[0]:
+            # Baza qayta yaratilgan - kesh endi yaroqsiz
+            return False
+        self.gallery.reset(yuz_ids, yuz_kodlari, nusxa=False)
+        self.belgi = belgi
+        self._yuklangan = True
+        return True
+
+    def sync(self):
+        """Oxirgi belgidan keyingi o'zgarishlarni galereyaga qo'llash"""
+        with self._lock:
+            if not self._yuklangan and self.cache is not None:
+                self._keshdan_yuklash()
+            natija = self.face_db.ozgarishlarni_olish(self.belgi)
+            if natija is None:
+                return False
+            yuz_ids, yuz_kodlari, ochirilgan_ids, belgi = natija
+            if not self._yuklangan:
+                self.gallery.reset(yuz_ids, yuz_kodlari)
+                self._yuklangan = True
+                if self.cache is not None:
+                    # Keyingi ishga tushish tez bo'lishi uchun keshni fonda yozish
+                    threading.Thread(target=self.save_cache, daemon=True).start()
+            else:
+                for yuz_id, yuz_kodi in zip(yuz_ids, yuz_kodlari):
+                    self.gallery.add(yuz_id, yuz_kodi)
+                    # Boshqa oyna yoki kompyuterda tahrirlangan bo'lishi mumkin
+                    self.face_db.keshni_bekor_qilish(yuz_id)
+                for yuz_id in ochirilgan_ids:
+                    self.gallery.remove(yuz_id)
+                    self.face_db.keshni_bekor_qilish(yuz_id)
+            self.belgi = belgi
+            return True
+
+    def save_cache(self):
+        """Galereya va belgini disk keshiga yozish"""
+        if self.cache is None or not self._yuklangan:
+            return False
+        with self._lock:
+            yuz_ids, yuz_kodlari = self.gallery.snapshot()
+            belgi = self.belgi
+        # Windows da mmap qilingan faylni almashtirib bo'lmaydi
+        self.gallery.detach_mmap()
+        return self.cache.save(yuz_ids, yuz_kodlari, belgi)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._toxtash.clear()
+        self._thread = threading.Thread(target=self._ishlash, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._toxtash.set()
+        if self._thread is not None:
+            self._thread.join(self.oraliq + 1)
+            self._thread = None
+
+    def _ishlash(self):
+        conn = None
+        while not self._toxtash.is_set():
+            if conn is None:
+                conn = self.face_db.tinglovchi_ulanish()
+            if conn is not None:
+                try:
+                    # NOTIFY kelishini yoki oraliq tugashini kutish
+                    select.select([conn], [], [], self.oraliq)
+                    conn.poll()
+                    conn.notifies.clear()
+                except Exception as e:
+                    print(f"LISTEN ulanishida xatolik: {e}")
+                    conn.close()
+                    conn = None
+            else:
+                self._toxtash.wait(self.oraliq)
+            if not self._toxtash.is_set():
+                self.sync()
+        if conn is not None:
+            conn.close()
+
+# Face Orientation Detector
+class FaceOrientationDetector:
+    """Yuz holati (yaw/pitch) frontalmi - yozish va moslash uchun
+
+    "dlib5" va "dlib68" rejimlarida ishchi kodlash paytida hisoblagan dlib
+    nuqtalari ishlatiladi (qo'shimcha model va rang o'girish yo'q); "mediapipe"
+    eski FaceMesh yo'li bo'lib, aniqlikni solishtirish uchun qoldirilgan.
+    """
+    # rejim -> (chap ko'z nuqtalari, o'ng ko'z nuqtalari, burun nuqtasi, pitch oralig'i)
+    # dlib5 da ko'z markazlari va burun asosi ishlatiladi, shuning uchun pitch oralig'i boshqacha
+    NUQTALAR = {
+        "dlib5": ((2, 3), (0, 1), 4, (0.5, 1.0)),
+        "dlib68": ((36,), (45,), 30, (0.3, 0.6)),
+    }
+
+    def __init__(self, rejim="dlib5"):
+        if rejim == "mediapipe" and mp is None:
+            print("Ogohlantirish: mediapipe o'rnatilmagan, dlib5 rejimi ishlatiladi")
+            rejim = "dlib5"
+        self.rejim = rejim
+        if rejim == "mediapipe":
+            self.mp_face_mesh = mp.solutions.face_mesh
+            self.face_mesh = self.mp_face_mesh.FaceMesh(static_image_mode=False, max_num_faces=1, refine_landmarks=True)
+
+    def detect(self, frame, nuqtalar=None):
+        """frame - BGR yuz qirqimi (faqat mediapipe uchun), nuqtalar - dlib nuqtalari (N, 2)"""
+        if self.rejim == "mediapipe":
+            return self._mediapipe_detect(frame)
+        if nuqtalar is None or len(nuqtalar) == 0:
+            return False
+        chap, ong, burun, pitch_oraligi = self.NUQTALAR[self.rejim]
+        left_eye = nuqtalar[list(chap)].mean(axis=0)
+        right_eye = nuqtalar[list(ong)].mean(axis=0)
+        return self._holat_togrimi(left_eye, right_eye, nuqtalar[burun], pitch_oraligi)
+
+    def frontallik(self, nuqtalar):
+        """0..1 baho: 1 - burun ko'zlar o'rtasida; nuqtalar bo'lmasa (mediapipe) 1.0"""
+        if self.rejim == "mediapipe" or nuqtalar is None or len(nuqtalar) == 0:
+            return 1.0
+        chap, ong, burun, _ = self.NUQTALAR[self.rejim]
+        left_eye = nuqtalar[list(chap)].mean(axis=0)
+        right_eye = nuqtalar[list(ong)].mean(axis=0)
+        eye_width = abs(right_eye[0] - left_eye[0])
+        if eye_width == 0:
+            return 0.0
+        nose_x_offset = abs(nuqtalar[burun][0] - (left_eye[0] + right_eye[0]) / 2)
+        return max(0.0, 1.0 - nose_x_offset / (eye_width * 0.08))
+
+    @staticmethod
+    def _holat_togrimi(left_eye, right_eye, nose, pitch_oraligi=(0.3, 0.6)):
+        eye_width = abs(right_eye[0] - left_eye[0])
+        if eye_width == 0:
+            return False
+        eye_x_center = (left_eye[0] + right_eye[0]) / 2
+        nose_x_offset = abs(nose[0] - eye_x_center)
+        yaw_ok = nose_x_offset < eye_width * 0.08
+
+        eye_y_avg = (left_eye[1] + right_eye[1]) / 2
+        vertical_dist = abs(nose[1] - eye_y_avg)
+        vertical_ratio = vertical_dist / eye_width
+        pitch_ok = pitch_oraligi[0] < vertical_ratio < pitch_oraligi[1]
+
+        return yaw_ok and pitch_ok
+
+    def _mediapipe_detect(self, frame):
+        h, w, _ = frame.shape
+        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        results = self.face_mesh.process(frame_rgb)
+
+        if not results.multi_face_landmarks:
+            return False
+
+        landmarks = results.multi_face_landmarks[0].landmark
+
+        left_eye = landmarks[33]
+        right_eye = landmarks[263]
+        nose = landmarks[1]
+
+        return self._holat_togrimi(
+            (left_eye.x * w, left_eye.y * h),
+            (right_eye.x * w, right_eye.y * h),
+            (nose.x * w, nose.y * h)
+        )
+
+# Face Tracker
+class FaceTrack:
+    """Bitta trek: oxirgi to'rtburchak va unga biriktirilgan shaxs"""
+    __slots__ = ("trek_id", "box", "face_id", "tekshirilgan_kadr", "korilgan_kadr", "kutilmoqda")
+
+    def __init__(self, trek_id, box, kadr=0):
+        self.trek_id = trek_id
+        self.box = box
+        self.face_id = None
+        self.tekshirilgan_kadr = None
+        # Trek oxirgi marta ko'ringan manba kadri raqami
+        self.korilgan_kadr = kadr
+        # Kodlash uchun yuborilgan, natija hali kelmagan
+        self.kutilmoqda = False
+
+
+class FaceTracker:
+    """Kadrlar orasida yuz to'rtburchaklariga IoU bo'yicha barqaror trek ID berish
+
+    Oraliqlar ishlangan kadrlarda emas, manba kadrlarida hisoblanadi, shuning
+    uchun ular tanish qadami (StrideController) o'zgarganda cho'zilmaydi.
+    """
+
+    def __init__(self, iou_chegarasi=0.3, tekshiruv_oraligi=15, max_yoqolish=5):
+        self.iou_chegarasi = iou_chegarasi
+        # Tanilgan trek shuncha manba kadrida bir marta qayta kodlanib tekshiriladi
+        self.tekshiruv_oraligi = tekshiruv_oraligi
+        # Shuncha manba kadri davomida ko'rinmagan trek o'chiriladi
+        self.max_yoqolish = max_yoqolish
+        self.tracks = {}
+        self.kadr = 0
+        self._keyingi_id = 1
+
+    @staticmethod
+    def iou(a, b):
+        """(top, right, bottom, left) to'rtburchaklar uchun IoU"""
+        top, right = max(a[0], b[0]), min(a[1], b[1])
+        bottom, left = min(a[2], b[2]), max(a[3], b[3])
+        kesishma = max(0, right - left) * max(0, bottom - top)
+        if kesishma == 0:
+            return 0.0
+        yuza_a = (a[1] - a[3]) * (a[2] - a[0])
+        yuza_b = (b[1] - b[3]) * (b[2] - b[0])
+        return kesishma / float(yuza_a + yuza_b - kesishma)
+
+    def update(self, locations, kadr=None):
+        """Yangi kadrdagi to'rtburchaklarni treklarga biriktirish; har biri uchun FaceTrack qaytaradi
+
+        kadr - manba kadri raqami (berilmasa har chaqiruv bitta kadr hisoblanadi).
+        """
+        self.kadr = self.kadr + 1 if kadr is None else max(self.kadr, kadr)
+        juftlar = sorted(
+            ((self.iou(trek.box, box), trek_id, i)
+             for trek_id, trek in self.tracks.items()
+             for i, box in enumerate(locations)),
+            reverse=True
+        )
+        natija = [None] * len(locations)
+        band_treklar = set()
+        for iou, trek_id, i in juftlar:
+            if iou < self.iou_chegarasi:
+                break
+            if trek_id in band_treklar or natija[i] is not None:
+                continue
+            trek = self.tracks[trek_id]
+            trek.box = locations[i]
+            trek.korilgan_kadr = self.kadr
+            natija[i] = trek
+            band_treklar.add(trek_id)
+
+        for trek_id in list(self.tracks):
+            if trek_id not in band_treklar:
+                if self.kadr - self.tracks[trek_id].korilgan_kadr > self.max_yoqolish:
+                    del self.tracks[trek_id]
+
+        for i, box in enumerate(locations):
+            if natija[i] is None:
+                trek = FaceTrack(self._keyingi_id, box, self.kadr)
+                self._keyingi_id += 1
+                self.tracks[trek.trek_id] = trek
+                natija[i] = trek
+        return natija
+
+    def needs_verification(self, trek):
+        """Trek hali tanilmagan yoki qayta tekshirish vaqti kelganmi"""
+        if trek.kutilmoqda:
+            return False
+        return (trek.face_id is None or trek.tekshirilgan_kadr is None
+                or self.kadr - trek.tekshirilgan_kadr >= self.tekshiruv_oraligi)
+
+    def mark_pending(self, trek):
+        trek.kutilmoqda = True
+
+    def release(self, trek):
+        trek.kutilmoqda = False
+
+    def set_identity(self, trek, face_id):
+        trek.face_id = face_id
+        trek.tekshirilgan_kadr = self.kadr
+        trek.kutilmoqda = False
+
+    def reset(self):
+        self.tracks.clear()
+        self.kadr = 0
+
+# Enrollment Buffer
+class EnrollmentGroup:
+    __slots__ = ("boshlangan", "oxirgi", "soni", "nomzodlar")
+
+    def __init__(self, vaqt):
+        self.boshlangan = vaqt
+        self.oxirgi = vaqt
+        self.soni = 0
+        # (baho, rasm, kod) - faqat eng yaxshilari saqlanadi
+        self.nomzodlar = []
+
+    def markaz(self):
+        return np.mean([kod for _, _, kod in self.nomzodlar], axis=0)
+
+
+class EnrollmentBuffer:
+    """Yangi yuz uchun qisqa oynada nomzodlar yig'ib, eng sifatlisini tanlash
+
+    Birinchi (ko'pincha xira yoki qiya) kadr doimiy shablon bo'lib qolmasligi
+    uchun nomzodlar aniqlik, o'lcham, frontallik va yoritilganlik bo'yicha
+    baholanadi. usul="best" eng yaxshi nomzod kodini, "average" esa eng
+    yaxshilarining o'rtacha kodini qaytaradi.
+    """
+
+    def __init__(self, oyna=1.0, min_nomzod=3, max_nomzod=10, usul="best", tolerance=0.5):
+        self.oyna = oyna
+        self.min_nomzod = min_nomzod
+        self.max_nomzod = max_nomzod
+        self.usul = usul
+        self.tolerance = tolerance
+        self.guruhlar = {}
+        self._hisoblagich = 0
+
+    @staticmethod
+    def baholash(rasm, frontallik=1.0):
+        """BGR yuz qirqimi sifati 0..1 oralig'ida"""
+        if rasm.size == 0:
+            return 0.0
+        kulrang = cv2.cvtColor(rasm, cv2.COLOR_BGR2GRAY)
+        # Xira rasmlarda Laplasian dispersiyasi kichik
+        aniqlik = min(1.0, cv2.Laplacian(kulrang, cv2.CV_64F).var() / 300.0)
+        olcham = min(1.0, kulrang.shape[0] / 160.0)
+        yoritilganlik = 1.0 - abs(float(kulrang.mean()) - 128.0) / 128.0
+        kontrast = min(1.0, float(kulrang.std()) / 50.0)
+        return 0.35 * aniqlik + 0.2 * olcham + 0.25 * frontallik + 0.1 * yoritilganlik + 0.1 * kontrast
+
+    def kalit_top(self, kamera_nomi, kod):
+        """Treksiz rejimda nomzodni kodi yaqin bo'lgan guruhga biriktirish"""
+        kod = np.asarray(kod, dtype=np.float64)
+        for kalit, guruh in self.guruhlar.items():
+            if kalit[0] == kamera_nomi and np.linalg.norm(guruh.markaz() - kod) < self.tolerance:
+                return kalit
+        self._hisoblagich += 1
+        return kamera_nomi, -self._hisoblagich
+
+    def add(self, kalit, rasm, kod, baho):
+        """Nomzod qo'shish; tanlov vaqti kelgan bo'lsa (rasm, kod), aks holda None"""
+        hozir = time.monotonic()
+        self._eskilarni_tozalash(hozir)
+        guruh = self.guruhlar.get(kalit)
+        if guruh is None:
+            guruh = self.guruhlar[kalit] = EnrollmentGroup(hozir)
+        guruh.nomzodlar.append((baho, rasm, np.asarray(kod, dtype=np.float64)))
+        guruh.nomzodlar.sort(key=lambda nomzod: nomzod[0], reverse=True)
+        del guruh.nomzodlar[self.max_nomzod:]
+        guruh.soni += 1
+        guruh.oxirgi = hozir
+
+        tayyor = guruh.soni >= self.max_nomzod or (
+            hozir - guruh.boshlangan >= self.oyna and guruh.soni >= self.min_nomzod
+        )
+        if not tayyor:
+            return None
+        del self.guruhlar[kalit]
+        eng_yaxshi_baho, rasm, kod = guruh.nomzodlar[0]
+        if self.usul == "average":
+            kod = np.mean([k for b, _, k in guruh.nomzodlar if b >= 0.8 * eng_yaxshi_baho], axis=0)
+        return rasm, kod
+
+    def _eskilarni_tozalash(self, hozir):
+        # Yetarli nomzod yig'ilmay yo'qolgan yuzlar (o'tib ketganlar) yozilmaydi
+        muddat = max(2 * self.oyna, 1.0)
+        for kalit in [k for k, guruh in self.guruhlar.items() if hozir - guruh.oxirgi > muddat]:
+            del self.guruhlar[kalit]
+
+
+# Face Detector Cascade
+class SSDFaceDetector:
+    """OpenCV DNN (res10 SSD) yuz detektori - dlib HOG/CNN oldidan arzon filtr"""
+    PROTOTXT = "deploy.prototxt"
+    MODEL = "res10_300x300_ssd_iter_140000.caffemodel"
+
+    def __init__(self, papka="assets", ishonch=0.5, kirish_olchami=300):
+        self.net = cv2.dnn.readNetFromCaffe(
+            os.path.join(papka, self.PROTOTXT),
+            os.path.join(papka, self.MODEL)
+        )
+        self.ishonch = ishonch
+        self.kirish_olchami = kirish_olchami
+
+    @classmethod
+    def mavjudmi(cls, papka="assets"):
+        return all(os.path.isfile(os.path.join(papka, nom)) for nom in (cls.PROTOTXT, cls.MODEL))
+
+    def detect(self, rgb):
+        """RGB kadrdagi yuzlar (top, right, bottom, left) ko'rinishida"""
+        h, w = rgb.shape[:2]
+        blob = cv2.dnn.blobFromImage(rgb, 1.0, (self.kirish_olchami, self.kirish_olchami),
+                                     (104.0, 177.0, 123.0), swapRB=True)
+        self.net.setInput(blob)
+        topilganlar = self.net.forward()[0, 0]
+        qutilar = []
+        for ishonch, x1, y1, x2, y2 in topilganlar[:, 2:7]:
+            if ishonch < self.ishonch:
+                continue
+            left, top = max(0, int(x1 * w)), max(0, int(y1 * h))
+            right, bottom = min(w, int(x2 * w)), min(h, int(y2 * h))
+            if right > left and bottom > top:
+                qutilar.append((top, right, bottom, left))
+        return qutilar
+
+
+# Har bir ishchi (oqim yoki jarayon) o'z SSD tarmog'ini saqlaydi - cv2.dnn.Net oqimlar uchun xavfsiz emas
+_ishchi_detektorlari = threading.local()
+
+
+def _ssd_detektori(papka, ishonch):
+    kesh = getattr(_ishchi_detektorlari, "kesh", None)
+    if kesh is None:
+        kesh = _ishchi_detektorlari.kesh = {}
+    kalit = (papka, ishonch)
+    if kalit not in kesh:
+        kesh[kalit] = SSDFaceDetector(papka, ishonch)
+    return kesh[kalit]
+
+
+def _kaskad_aniqlash(rgb, model, detektor):
+    """Detektor kaskadi: avval SSD, dlib faqat SSD topgan joylar atrofida
+
+    detektor None bo'lsa butun kadrda dlib; aks holda (rejim, papka, ishonch),
+    bu yerda rejim "ssd" (SSD qutilari to'g'ridan-to'g'ri) yoki "cascade".
+    """
+    if detektor is None:
+        return face_recognition.face_locations(rgb, model=model)
+    rejim, papka, ishonch = detektor
+    qutilar = _ssd_detektori(papka, ishonch).detect(rgb)
+    if rejim == "ssd" or not qutilar:
+        return qutilar
+
+    # dlib bilan aniqlashtirish: faqat kengaytirilgan ROI larda
+    h, w = rgb.shape[:2]
+    natija = []
+    for top, right, bottom, left in qutilar:
+        chet = max(bottom - top, right - left) // 3
+        y0, y1 = max(0, top - chet), min(h, bottom + chet)
+        x0, x1 = max(0, left - chet), min(w, right + chet)
+        roi = np.ascontiguousarray(rgb[y0:y1, x0:x1])
+        # HOG ~80px dan kichik yuzlarni ko'rmaydi, kichik ROI kattalashtiriladi
+        marta = 1 if (y1 - y0) < 160 else 0
+        for t, r, b, l in face_recognition.face_locations(roi, number_of_times_to_upsample=marta, model=model):
+            joy = (t + y0, r + x0, b + y0, l + x0)
+            # Qo'shni ROI lar kesishsa bitta yuz ikki marta topilmasin
+            if all(FaceTracker.iou(joy, boshqa) < 0.5 for boshqa in natija):
+                natija.append(joy)
+    return natija
+
+
+# Frame Pipeline
+# Ishchi jarayonda ulangan umumiy xotira bloklari (nomi -> SharedMemory, eng eskisi birinchi)
+_ishchi_xotiralari = OrderedDict()
+_ISHCHI_XOTIRALARI_MAX = 32
+
+
+def _ishchini_boshlash():
+    """Ishchi jarayonda dlib modellarini bir marta yuklab, qizdirib qo'yish"""
+    bosh_kadr = np.zeros((64, 64, 3), dtype=np.uint8)
+    face_recognition.face_locations(bosh_kadr)
+    face_recognition.face_encodings(bosh_kadr, [(8, 56, 56, 8)])
+
+
+def _kadrni_olish(manba):
+    """Kadr manbai: massivning o'zi yoki umumiy xotiradagi (nomi, shakl, indeks)"""
+    if isinstance(manba, np.ndarray):
+        return manba
+    nomi, shakl, indeks = manba
+    xotira = _ishchi_xotiralari.get(nomi)
+    if xotira is None:
+        # Har bir kameraning o'z halqasi bor; faqat uzoq ishlatilmaganlari yopiladi
+        while len(_ishchi_xotiralari) >= _ISHCHI_XOTIRALARI_MAX:
+            _, eski = _ishchi_xotiralari.popitem(last=False)
+            try:
+                eski.close()
+            except BufferError:
+                pass
+        xotira = SharedFrameRing.ulanish(nomi)
+        _ishchi_xotiralari[nomi] = xotira
+    else:
+        _ishchi_xotiralari.move_to_end(nomi)
+    hajm = int(np.prod(shakl))
+    return np.ndarray(shakl, dtype=np.uint8, buffer=xotira.buf, offset=indeks * hajm)
+
+
+def _yuzlarni_aniqlash(manba, model, detektor=None):
+    """Ishchida bajariladi: kadrdagi yuzlar joylashuvi"""
+    return _kaskad_aniqlash(_kadrni_olish(manba), model, detektor)
+
+
+def _yuzlarni_kodlash(manba, locations, holat_rejimi="dlib5"):
+    """Ishchida bajariladi: berilgan joylar uchun (128 o'lchamli kod, holat nuqtalari)
+
+    Kod va yuz holati bitta 5 nuqtali dlib landmark o'tishidan olinadi; dlib68
+    rejimida holat uchun qo'shimcha (arzon) 68 nuqtali prediktor ishlatiladi.
+    """
+    rasm = _kadrni_olish(manba)
+    natijalar = []
+    for top, right, bottom, left in locations:
+        quti = dlib.rectangle(left, top, right, bottom)
+        shakl = face_recognition.api.pose_predictor_5_point(rasm, quti)
+        kod = np.array(face_recognition.api.face_encoder.compute_face_descriptor(rasm, shakl, 1))
+        if holat_rejimi == "dlib68":
+            shakl = face_recognition.api.pose_predictor_68_point(rasm, quti)
+        nuqtalar = None
+        if holat_rejimi != "mediapipe":
+            nuqtalar = np.array([(p.x, p.y) for p in shakl.parts()], dtype=np.float32)
+        natijalar.append((kod, nuqtalar))
+    return natijalar
+
+
+class SharedFrameRing:
+    """Kadrlarni ishchi jarayonlarga pickle qilmasdan uzatish uchun umumiy xotira halqasi
+
+    Har bir slot bitta kadr sig'adi; slot vazifa tugaguncha (yoki tashlanguncha)
+    band turadi va ozod_qilish() bilan qaytariladi. Keraksiz bo'lgan halqa
+    yopishni_rejalash() bilan oxirgi band slot qaytganda yopiladi.
+    """
+
+    def __init__(self, shakl, slot_soni):
+        self.shakl = tuple(shakl)
+        self.slot_soni = slot_soni
+        self._hajm = int(np.prod(self.shakl))
+        self.xotira = shared_memory.SharedMemory(create=True, size=self._hajm * slot_soni)
+        self._bosh_slotlar = queue.Queue()
+        for indeks in range(slot_soni):
+            self._bosh_slotlar.put(indeks)
+        self._lock = threading.Lock()
+        self._yopilsin = False
+        self._yopilgan = False
+
+    @staticmethod
+    def ulanish(nomi):
+        """Ishchi tomonda mavjud blokka ulanish (o'chirishni yaratuvchi jarayon bajaradi)"""
+        try:
+            return shared_memory.SharedMemory(name=nomi, track=False)
+        except TypeError:
+            # Python < 3.13 da track parametri yo'q
+            return shared_memory.SharedMemory(name=nomi)
+
+    def yozish(self, kadr, timeout=0.5):
+        """Kadrni bo'sh slotga nusxalash; (nomi, shakl, indeks) yoki slot bo'lmasa None"""
+        try:
+            indeks = self._bosh_slotlar.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        joy = np.ndarray(self.shakl, dtype=np.uint8, buffer=self.xotira.buf, offset=indeks * self._hajm)
+        joy[...] = kadr
+        del joy
+        return self.xotira.name, self.shakl, indeks
+
+    def ozod_qilish(self, manba):
+        self._bosh_slotlar.put(manba[2])
+        if self._yopilsin:
+            self._bosh_bolsa_yopish()
+
+    def yopishni_rejalash(self):
+        """Yangi kadr yozilmaydi; ishchilardagi slotlar qaytgach xotira yopiladi"""
+        self._yopilsin = True
+        self._bosh_bolsa_yopish()
+
+    def _bosh_bolsa_yopish(self):
+        with self._lock:
+            if self._bosh_slotlar.qsize() < self.slot_soni:
+                return
+        self.close()
+
+    def close(self):
+        with self._lock:
+            if self._yopilgan:
+                return
+            self._yopilgan = True
+        try:
+            self.xotira.close()
+            self.xotira.unlink()
+        except (BufferError, FileNotFoundError) as e:
+            print("Umumiy xotirani yopishda xatolik:", e)
+
+
+class LatestFrameSlot:
+    """Faqat eng oxirgi kadrni saqlovchi slot: yangi kadr eskisini almashtiradi"""
+
+    def __init__(self, cond=None):
+        # Bir nechta slot umumiy shart o'zgaruvchisini bo'lishi mumkin (CameraManager)
+        self._cond = cond or threading.Condition()
+        self._kadr = None
+        self._seq = 0
+        self.yopilgan = False
+
+    def put(self, kadr):
+        with self._cond:
+            self._kadr = kadr
+            self._seq += 1
+            self._cond.notify_all()
+
+    def get(self, oxirgi_seq=0, timeout=None):
+        """oxirgi_seq dan yangiroq kadrni kutish; (seq, kadr) yoki (oxirgi_seq, None)"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > oxirgi_seq or self.yopilgan, timeout)
+            if self._seq > oxirgi_seq:
+                return self._seq, self._kadr
+            return oxirgi_seq, None
+
+    def oxirgi(self):
+        """Kutmasdan joriy (seq, kadr)"""
+        with self._cond:
+            return self._seq, self._kadr
+
+    def close(self):
+        with self._cond:
+            self.yopilgan = True
+            self._cond.notify_all()
+
+
+class FrameGrabber:
+    """Kameradan uzluksiz o'qib, eng oxirgi kadrni slotga qo'yuvchi oqim"""
+
+    def __init__(self, video_capture, slot=None, fayl=False):
+        self.video_capture = video_capture
+        self.slot = slot or LatestFrameSlot()
+        # Video fayl o'z FPS tezligida o'qiladi va oxiriga yetganda boshidan boshlanadi
+        self.fayl = fayl
+        fps = video_capture.get(cv2.CAP_PROP_FPS) if fayl else 0
+        self._oraliq = 1.0 / fps if fps and fps > 0 else 0
+        self._seq = 0
+        self._toxtash = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._toxtash.clear()
+        self._thread = threading.Thread(target=self._ishlash, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        self._toxtash.set()
+        self.slot.close()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def get(self, timeout=None):
+        """Oldingi chaqiruvdan keyin kelgan eng oxirgi kadr yoki None"""
+        self._seq, kadr = self.slot.get(self._seq, timeout)
+        return kadr
+
+    def _ishlash(self):
+        keyingi = time.monotonic()
+        while not self._toxtash.is_set():
+            ret, frame = self.video_capture.read()
+            if not ret:
+                if self.fayl:
+                    self.video_capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                else:
+                    time.sleep(0.01)
+                continue
+            self.slot.put(frame)
+            if self._oraliq:
+                keyingi += self._oraliq
+                kutish = keyingi - time.monotonic()
+                if kutish > 0:
+                    self._toxtash.wait(kutish)
+                else:
+                    keyingi = time.monotonic()
+
+
+class MotionGate:
+    """Kichraytirilgan kadrlar farqi bo'yicha harakat darvozasi
+
+    Sahna harakatsiz bo'lsa aniqlash va kodlash umuman ishga tushirilmaydi.
+    Harakatdan keyin sovish soniyalari davomida darvoza ochiq qoladi, shunda
+    joyida turgan odam ham tanib olinadi.
+    """
+
+    def __init__(self, chegara=0.01, sovish=2.0, piksel_chegarasi=25, kenglik=80):
+        # Kadrning qancha ulushi o'zgarsa harakat hisoblanadi
+        self.chegara = chegara
+        self.sovish = sovish
+        self.piksel_chegarasi = piksel_chegarasi
+        self.kenglik = kenglik
+        self._oldingi = None
+        self._ochiq_muddat = 0.0
+
+    def reset(self):
+        self._oldingi = None
+        self._ochiq_muddat = 0.0
+
+    def ochiqmi(self, kadr):
+        """Kadrni ishlash kerakmi (harakat bor yoki sovish muddati tugamagan)"""
+        h, w = kadr.shape[:2]
+        kichik = cv2.resize(kadr, (self.kenglik, max(1, h * self.kenglik // w)), interpolation=cv2.INTER_AREA)
+        kichik = cv2.GaussianBlur(cv2.cvtColor(kichik, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+        oldingi, self._oldingi = self._oldingi, kichik
+        hozir = time.monotonic()
+        if oldingi is None or oldingi.shape != kichik.shape:
+            self._ochiq_muddat = hozir + self.sovish
+            return True
+        ozgargan = np.count_nonzero(cv2.absdiff(kichik, oldingi) > self.piksel_chegarasi)
+        if ozgargan >= self.chegara * kichik.size:
+            self._ochiq_muddat = hozir + self.sovish
+        return hozir < self._ochiq_muddat
+
+
+class CameraSource:
+    """Bitta kamera manbai: qurilma indeksi, video fayl yoki RTSP/HTTP URL"""
+
+    def __init__(self, manba, nomi=None, tracking=True):
+        self.manba = int(manba) if str(manba).isdigit() else manba
+        self.nomi = nomi or f"Kamera {manba}"
+        self.fayl = isinstance(self.manba, str) and os.path.isfile(self.manba)
+        # Treklar kameraga xos, galereya va log yozuvchi esa umumiy
+        self.tracker = FaceTracker() if tracking else None
+        # Ixtiyoriy harakat darvozasi (MotionGate) va u yopiq turib qolganmi
+        self.harakat = None
+        self.harakat_yopiq = False
+        self.video_capture = None
+        self.grabber = None
+        self.seq = 0
+        # Ekranda ko'rsatiladigan eng oxirgi ishlangan kadr
+        self.oxirgi_kadr = None
+        # Oxirgi chiqarilgan holat va asosiy shaxs (hodisalar faqat o'zgarganda)
+        self.holat = None
+        self.joriy_id = None
+        # Oxirgi tanish natijasi izohlari - har bir ko'rsatiladigan kadr ustiga chiziladi
+        self.izohlar = []
+        self.ekran_seq = 0
+        self.qadam_hisob = 0
+
+    def ochish(self, cond=None):
+        self.video_capture = cv2.VideoCapture(self.manba)
+        if not self.video_capture.isOpened():
+            self.video_capture.release()
+            self.video_capture = None
+            return False
+        # Tarmoq oqimlarida eskirgan kadrlar to'planmasin
+        self.video_capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        self.grabber = FrameGrabber(self.video_capture, LatestFrameSlot(cond), fayl=self.fayl)
+        self.seq = 0
+        self.oxirgi_kadr = None
+        self.holat = None
+        self.joriy_id = None
+        self.izohlar = []
+        self.ekran_seq = 0
+        self.qadam_hisob = 0
+        self.harakat_yopiq = False
+        if self.harakat:
+            self.harakat.reset()
+        if self.tracker:
+            self.tracker.reset()
+        return True
+
+    def yopish(self):
+        if self.video_capture is not None:
+            self.video_capture.release()
+            self.video_capture = None
+        self.grabber = None
+
+
+class CameraManager:
+    """Bir nechta kamerani boshqarish va kadrlarni ular orasida navbat bilan berish
+
+    get() har safar navbatdagi, yangi kadri bor kamerani tanlaydi (round-robin),
+    shuning uchun tez kamera sekinlarining tanish ulushini egallab olmaydi.
+    """
+
+    def __init__(self, manbalar, tracking=True):
+        self.kameralar = [CameraSource(manba, tracking=tracking) for manba in manbalar]
+        self.faol = []
+        self._cond = threading.Condition()
+        self._navbat = 0
+        self._toxtatilgan = False
+
+    def ochish(self):
+        """Barcha manbalarni ochish; ochilganlari soni"""
+        self.faol = []
+        for kamera in self.kameralar:
+            if kamera.ochish(self._cond):
+                self.faol.append(kamera)
+            else:
+                print(f"{kamera.nomi} ni ochib bo'lmadi")
+        return len(self.faol)
+
+    def start(self):
+        self._toxtatilgan = False
+        for kamera in self.faol:
+            kamera.grabber.start()
+
+    def stop(self, timeout=2.0):
+        with self._cond:
+            self._toxtatilgan = True
+            self._cond.notify_all()
+        for kamera in self.faol:
+            kamera.grabber.stop(timeout)
+
+    def yopish(self):
+        for kamera in self.faol:
+            kamera.yopish()
+        self.faol = []
+
+    def get(self, timeout=None):
+        """Navbatdagi kameraning yangi kadri: (kamera, kadr) yoki None"""
+        tugash = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not self._toxtatilgan:
+                soni = len(self.faol)
+                for qadam in range(soni):
+                    indeks = (self._navbat + qadam) % soni
+                    kamera = self.faol[indeks]
+                    seq, kadr = kamera.grabber.slot.oxirgi()
+                    if seq > kamera.seq:
+                        kamera.seq = seq
+                        self._navbat = (indeks + 1) % soni
+                        return kamera, kadr
+                qolgan = None if tugash is None else tugash - time.monotonic()
+                if qolgan is not None and qolgan <= 0:
+                    break
+                self._cond.wait(qolgan)
+        return None
+
+    def display_frames(self, timeout=None):
+        """Ekran uchun: oldingi chaqiruvdan keyin yangilangan barcha kameralar [(kamera, kadr)]"""
+        with self._cond:
+            for urinish in range(2):
+                yangilar = []
+                for kamera in self.faol:
+                    seq, kadr = kamera.grabber.slot.oxirgi()
+                    if seq > kamera.ekran_seq:
+                        kamera.ekran_seq = seq
+                        yangilar.append((kamera, kadr))
+                if yangilar or urinish or self._toxtatilgan:
+                    return yangilar
+                self._cond.wait(timeout)
+        return []
+
+    def mozaika(self):
+        """Kameralarning oxirgi kadrlaridan bitta to'r (grid) rasm"""
+        kadrlar = [kamera.oxirgi_kadr for kamera in self.faol]
+        if len(kadrlar) == 1:
+            return kadrlar[0]
+        namuna = next((kadr for kadr in kadrlar if kadr is not None), None)
+        if namuna is None:
+            return None
+        ustunlar = int(np.ceil(np.sqrt(len(kadrlar))))
+        qatorlar = int(np.ceil(len(kadrlar) / ustunlar))
+        balandlik, kenglik = namuna.shape[:2]
+        balandlik, kenglik = balandlik // ustunlar, kenglik // ustunlar
+        mozaika = np.zeros((balandlik * qatorlar, kenglik * ustunlar, 3), dtype=np.uint8)
+        for indeks, (kamera, kadr) in enumerate(zip(self.faol, kadrlar)):
+            if kadr is None:
+                continue
+            y, x = (indeks // ustunlar) * balandlik, (indeks % ustunlar) * kenglik
+            mozaika[y:y + balandlik, x:x + kenglik] = cv2.resize(kadr, (kenglik, balandlik))
+            cv2.putText(mozaika, kamera.nomi, (x + 10, y + balandlik - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        return mozaika
+
+
+def _olchab(funksiya, *argumentlar):
+    """Ishchida bajariladi: funksiya natijasi va unga sarflangan soniya"""
+    boshlanish = time.perf_counter()
+    natija = funksiya(*argumentlar)
+    return natija, time.perf_counter() - boshlanish
+
+
+class StageQueue:
+    """Bosqichlar orasidagi cheklangan navbat va to'lgandagi tashlash siyosati"""
+    SIYOSATLAR = ("block", "drop_oldest", "drop_newest")
+
+    def __init__(self, maxsize, siyosat="block", tashlanganda=None):
+        if siyosat not in self.SIYOSATLAR:
+            raise ValueError(f"Noma'lum siyosat: {siyosat}")
+        self.siyosat = siyosat
+        self.tashlanganda = tashlanganda
+        self.tashlanganlar = 0
+        self._q = queue.Queue(maxsize)
+
+    def _tashlash(self, element):
+        self.tashlanganlar += 1
+        if self.tashlanganda is not None:
+            self.tashlanganda(element)
+
+    def put(self, element, toxtash=None):
+        if self.siyosat == "block":
+            while toxtash is None or not toxtash.is_set():
+                try:
+                    self._q.put(element, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            self._tashlash(element)
+            return False
+        if self.siyosat == "drop_newest":
+            try:
+                self._q.put_nowait(element)
+                return True
+            except queue.Full:
+                self._tashlash(element)
+                return False
+        while True:
+            try:
+                self._q.put_nowait(element)
+                return True
+            except queue.Full:
+                try:
+                    self._tashlash(self._q.get_nowait())
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=None):
+        return self._q.get(timeout=timeout)
+
+    def drain(self):
+        """Navbatdagi barcha elementlarni tashlab yuborish"""
+        while True:
+            try:
+                self._tashlash(self._q.get_nowait())
+            except queue.Empty:
+                return
+
+
+class FramePipeline:
+    """Ushlash -> tayyorlash -> aniqlash -> kodlash -> yakunlash bosqichlari
+
+    tayyorlash(kadr) manba.get() bergan elementni olib (vazifa, ish) qaytaradi, bu yerda ish - ishchi pulga
+    yuboriladigan (funksiya, *argumentlar); aniqlash(vazifa, natija) ish natijasini
+    kadrlar tartibida oladi. kodlash(vazifa) yana ish yoki None qaytaradi,
+    yakunlash(vazifa, natija) esa natijalarni kadrlar tartibida oladi.
+
+    olchovchi(bosqich, soniya) berilsa har bir bosqich narxi ("tayyorlash",
+    "aniqlash", "kodlash", "yakunlash") va to'liq "kechikish" unga yuboriladi.
+    """
+
+    def __init__(self, manba, tayyorlash, aniqlash, kodlash, yakunlash, executor,
+                 navbat_hajmi=2, max_parallel=4, tashlanganda=None, olchovchi=None):
+        # Kadr manbai: start/stop va get(timeout) beruvchi FrameGrabber yoki CameraManager
+        self.manba = manba
+        self.tayyorlash = tayyorlash
+        self.aniqlash = aniqlash
+        self.kodlash = kodlash
+        self.yakunlash = yakunlash
+        self.executor = executor
+        # Tayyorlash -> aniqlash: ishchilar band bo'lsa yangi kadr olinmaydi
+        self.aniqlanayotganlar = StageQueue(max_parallel, "block", self._jarayondagini_tashlash)
+        # Aniqlash -> kodlash: eng eskisi tashlanadi, kechikish cheklangan bo'lsin
+        self.kodlash_navbati = StageQueue(navbat_hajmi, "drop_oldest", lambda element: self._tashlash(element[0]))
+        # Kodlash -> yakunlash: ishchilar band bo'lsa dispetcher kutadi (backpressure)
+        self.jarayondagilar = StageQueue(max_parallel, "block", self._jarayondagini_tashlash)
+        self.tashlanganda = tashlanganda
+        self.olchovchi = olchovchi
+        self._toxtash = threading.Event()
+        self._threads = []
+
+    def start(self):
+        self._toxtash.clear()
+        self.manba.start()
+        self._threads = [
+            threading.Thread(target=self._tayyorlash_bosqichi, daemon=True),
+            threading.Thread(target=self._aniqlash_bosqichi, daemon=True),
+            threading.Thread(target=self._kodlash_bosqichi, daemon=True),
+            threading.Thread(target=self._yakunlash_bosqichi, daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout=2.0):
+        self._toxtash.set()
+        self.manba.stop(timeout)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        self.aniqlanayotganlar.drain()
+        self.kodlash_navbati.drain()
+        self.jarayondagilar.drain()
+
+    def _jarayondagini_tashlash(self, element):
+        vazifa, future, _ = element
+        if future is not None:
+            future.cancel()
+        self._tashlash(vazifa)
+
+    def _tashlash(self, vazifa):
+        if self.tashlanganda is not None:
+            self.tashlanganda(vazifa)
+
+    def _olchov(self, bosqich, soniya):
+        if self.olchovchi is not None:
+            self.olchovchi(bosqich, soniya)
+
+    def _natija(self, future, bosqich):
+        """Ishchi natijasini ochish va uning narxini qayd qilish"""
+        natija, sarf = future.result()
+        self._olchov(bosqich, sarf)
+        return natija
+
+    def _tayyorlash_bosqichi(self):
+        while not self._toxtash.is_set():
+            kadr = self.manba.get(timeout=0.5)
+            if kadr is None:
+                continue
+            boshlangan = time.monotonic()
+            try:
+                tayyor = self.tayyorlash(kadr)
+            except Exception as e:
+                print("Tayyorlash bosqichida xatolik:", e)
+                continue
+            if tayyor is None:
+                continue
+            self._olchov("tayyorlash", time.monotonic() - boshlangan)
+            vazifa, ish = tayyor
+            try:
+                future = self.executor.submit(_olchab, *ish)
+            except Exception as e:
+                print("Aniqlash bosqichida xatolik:", e)
+                self._tashlash(vazifa)
+                continue
+            self.aniqlanayotganlar.put((vazifa, future, boshlangan), self._toxtash)
+
+    def _aniqlash_bosqichi(self):
+        while not self._toxtash.is_set():
+            try:
+                vazifa, future, boshlangan = self.aniqlanayotganlar.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                natija = self.aniqlash(vazifa, self._natija(future, "aniqlash"))
+            except Exception as e:
+                print("Aniqlash bosqichida xatolik:", e)
+                natija = None
+            if natija is None:
+                self._tashlash(vazifa)
+                continue
+            self.kodlash_navbati.put((natija, boshlangan))
+
+    def _kodlash_bosqichi(self):
+        while not self._toxtash.is_set():
+            try:
+                vazifa, boshlangan = self.kodlash_navbati.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            future = None
+            try:
+                ish = self.kodlash(vazifa)
+                if ish is not None:
+                    future = self.executor.submit(_olchab, *ish)
+            except Exception as e:
+                print("Kodlash bosqichida xatolik:", e)
+            self.jarayondagilar.put((vazifa, future, boshlangan), self._toxtash)
+
+    def _yakunlash_bosqichi(self):
+        while not self._toxtash.is_set():
+            try:
+                vazifa, future, boshlangan = self.jarayondagilar.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            natija = None
+            if future is not None:
+                try:
+                    natija = self._natija(future, "kodlash")
+                except Exception as e:
+                    print("Kodlashda xatolik:", e)
+            yakunlash_boshi = time.monotonic()
+            try:
+                self.yakunlash(vazifa, natija)
+            except Exception as e:
+                print("Xatolik:", e)
+            tugadi = time.monotonic()
+            self._olchov("yakunlash", tugadi - yakunlash_boshi)
+            self._olchov("kechikish", tugadi - boshlangan)
+
+
+class StrideController:
+    """Tanish qadamini (har N-kadrdan biri) bosqichlar narxi bo'yicha moslashtirish
+
+    Qadam ikki shartning kattasi: to'liq kechikish o'rtachasi maqsad_kechikish
+    dan oshmasin va aniqlash+kodlash narxi * tanlangan kadrlar tezligi ishchilar
+    quvvatining cpu_byudjeti ulushidan oshmasin. Ekran bunga bog'liq emas.
+    """
+
+    def __init__(self, maqsad_kechikish=0.3, cpu_byudjeti=1.0, workers=1,
+                 min_qadam=1, max_qadam=30, alfa=0.2):
+        self.maqsad_kechikish = maqsad_kechikish
+        self.cpu_byudjeti = cpu_byudjeti
+        self.workers = workers
+        self.min_qadam = min_qadam
+        self.max_qadam = max_qadam
+        self.alfa = alfa
+        self.qadam = min_qadam
+        # bosqich -> eksponensial o'rtacha narx (soniya)
+        self.ortacha = {}
+        self._kadr_vaqtlari = deque(maxlen=60)
+        self._lock = threading.Lock()
+
+    def olchov(self, bosqich, soniya):
+        with self._lock:
+            eski = self.ortacha.get(bosqich)
+            self.ortacha[bosqich] = soniya if eski is None else eski + self.alfa * (soniya - eski)
+            if bosqich == "kechikish":
+                self._moslash()
+
+    def tanlash(self, kamera):
+        """Kadr tanishga yuborilsinmi (kameraning har qadam-kadri)"""
+        with self._lock:
+            self._kadr_vaqtlari.append(time.monotonic())
+            kamera.qadam_hisob += 1
+            return kamera.qadam_hisob % self.qadam == 0
+
+    def _kirish_fps(self):
+        if len(self._kadr_vaqtlari) < 2:
+            return 0.0
+        oraliq = self._kadr_vaqtlari[-1] - self._kadr_vaqtlari[0]
+        return (len(self._kadr_vaqtlari) - 1) / oraliq if oraliq > 0 else 0.0
+
+    def _moslash(self):
+        # CPU byudjeti: bitta kadr narxi * (kirish fps / qadam) <= byudjet * ishchilar
+        narx = self.ortacha.get("aniqlash", 0.0) + self.ortacha.get("kodlash", 0.0)
+        byudjet = self.cpu_byudjeti * self.workers
+        byudjet_qadami = int(np.ceil(narx * self._kirish_fps() / byudjet)) if narx and byudjet > 0 else 1
+
+        # Kechikish maqsadi: oshsa qadam kattalashadi, ancha past bo'lsa kichrayadi
+        kechikish = self.ortacha["kechikish"]
+        qadam = self.qadam
+        if kechikish > self.maqsad_kechikish:
+            qadam += 1
+        elif kechikish < 0.6 * self.maqsad_kechikish:
+            qadam -= 1
+        self.qadam = int(min(self.max_qadam, max(self.min_qadam, byudjet_qadami, qadam)))
+
+
+class RecognitionJob:
+    """Bitta kadr bo'yicha bosqichlar orasida uzatiladigan ma'lumotlar"""
+    __slots__ = ("kamera", "frame", "kadr_raqami", "kadr_manbai", "halqa", "small_locations",
+                 "face_locations", "tracks", "kodlanadigan", "kutilayotgan", "natijalar", "izohlar")
+
+    def __init__(self, kamera, frame, kadr_manbai, halqa=None):
+        self.kamera = kamera
+        self.frame = frame
+        # Kameradan o'qilgan kadr raqami - treklash oraliqlari shunda hisoblanadi
+        self.kadr_raqami = kamera.seq
+        # Yarim o'lchamli RGB kadr yoki uning umumiy xotiradagi manbai
+        self.kadr_manbai = kadr_manbai
+        self.halqa = halqa
+        self.small_locations = []
+        self.face_locations = []
+        self.tracks = []
+        # Kodlanishi kerak bo'lgan yuzlar indekslari
+        self.kodlanadigan = []
+        # Boshqa kadrda tekshirilayotgan (natijasi hali noma'lum) yuzlar
+        self.kutilayotgan = []
+        # indeks -> face_id (None - noma'lum shaxs)
+        self.natijalar = {}
+        # Ekranda ustiga chiziladigan (joy yoki None, yozuv) juftliklari
+        self.izohlar = []
+
+# Recognition Engine
+class RecognitionEvent:
+    """Dvigatel hodisasi
+
+    Turlari: "holat" (matn), "tanildi" (face_id), "nomalum", "yangi" (face_id)
+    va "kirish" (face_id, vaqt). "holat", "tanildi" va "nomalum" har bir kamera
+    uchun faqat o'zgarganda chiqariladi.
+    """
+    __slots__ = ("turi", "kamera", "face_id", "matn", "vaqt")
+
+    def __init__(self, turi, kamera=None, face_id=None, matn=None, vaqt=None):
+        self.turi = turi
+        self.kamera = kamera
+        self.face_id = face_id
+        self.matn = matn
+        self.vaqt = vaqt or datetime.now()
+
+    def as_dict(self):
+        return {
+            'turi': self.turi,
+            'kamera': self.kamera,
+            'face_id': self.face_id,
+            'matn': self.matn,
+            'vaqt': self.vaqt.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+
+class RecognitionEngine:
+    """Tkinter'siz tanish dvigateli: kameralar, aniqlash/kodlash, moslash va loglash
+
+    Natijalar add_listener() bilan qo'shilgan tinglovchilarga RecognitionEvent
+    sifatida beriladi. Tinglovchilar pipeline oqimida chaqiriladi, shuning uchun
+    GUI ularni o'z navbatiga qo'yib, asosiy oqimda qayta ishlashi kerak.
+    """
+
+    def __init__(self, face_db, cameras=None, multi_face=False, tracking=True,
+                 backend="process", workers=None, kadrlarni_uzatish=False,
+                 detector="dlib", ssd_papka="assets", ssd_ishonch=0.5,
+                 motion_gate=False, harakat_chegarasi=0.01, harakat_sovishi=2.0,
+                 orientation="dlib5", enroll_oyna=1.0, enroll_usul="best",
+                 maqsad_kechikish=0.3, cpu_byudjeti=1.0, max_qadam=30,
+                 search_mode="exact", nprobe=8, ef_search=64):
+        self.face_db = face_db
+        # Barcha kameralar bitta galereya va bitta log yozuvchidan foydalanadi
+        self.cameras = CameraManager(cameras or [0], tracking=tracking)
+        if motion_gate:
+            # Tunda uzoq bo'sh turgan sahnalarda aniqlash/kodlash o'tkazib yuboriladi
+            for kamera in self.cameras.kameralar:
+                kamera.harakat = MotionGate(harakat_chegarasi, harakat_sovishi)
+        # Taqribiy qidiruv (ivf/hnsw/auto) faqat aniq tanlanganda - o'tkazib yuborilgan
+        # moslik noma'lum shaxs sifatida qayta ro'yxatga olinadi
+        self.gallery = GalleryIndex(search_mode=search_mode, nprobe=nprobe, ef_search=ef_search)
+        self.gallery_sync = GallerySync(self.face_db, self.gallery, cache=EncodingCache())
+        self.face_detector = FaceOrientationDetector(orientation)
+        # Yangi yuzlar darhol emas, enroll_oyna soniya ichidagi eng sifatli nomzoddan yoziladi
+        self.enrollment = EnrollmentBuffer(enroll_oyna, usul=enroll_usul) if enroll_oyna > 0 else None
+        self.last_log_times = {}
+        self.running = False
+        # True bo'lsa kadrdagi barcha yuzlar tanib olinadi, aks holda faqat bitta yuzli kadrlar
+        self.multi_face = multi_face
+        # Aniqlash/kodlash ishchilari: "process" - jarayonlar puli, "thread" - oqimlar
+        # (birinchi ishga tushishda yaratiladi va iliq saqlanadi)
+        self.backend = backend
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.executor = None
+        # kamera nomi -> SharedFrameRing (kameralar o'lchami har xil bo'lishi mumkin)
+        self.frame_rings = {}
+        self.pipeline = None
+        # Tanish qadami moslashuvchan, ekran esa har bir olingan kadrni ko'rsatadi
+        self.stride = StrideController(maqsad_kechikish, cpu_byudjeti, self.workers, max_qadam=max_qadam)
+        self._ekran_thread = None
+        # Aniqlash: "dlib" - butun kadrda, "ssd"/"cascade" - avval arzon SSD filtr
+        self.detector = None
+        if detector != "dlib":
+            if SSDFaceDetector.mavjudmi(ssd_papka):
+                self.detector = (detector, ssd_papka, ssd_ishonch)
+            else:
+                print(f"Ogohlantirish: SSD modeli {ssd_papka} da topilmadi, dlib ishlatiladi")
+        # Annotatsiyali kadrlar faqat ekran bo'lsa chiziladi va frame_queue ga qo'yiladi
+        self.kadrlarni_uzatish = kadrlarni_uzatish
+        self.frame_queue = queue.Queue(maxsize=1)
+        self.tinglovchilar = []
+        self.log_writer = EntryLogWriter(self.face_db)
+        self.log_writer.start()
+
+        # Check for GPU acceleration
+        self.gpu_enabled = False
+        try:
+            import dlib
+            if dlib.DLIB_USE_CUDA:
+                self.gpu_enabled = True
+                print("GPU acceleration is enabled for face recognition")
+            else:
+                print("Warning: GPU acceleration not available for face recognition")
+        except:
+            print("Warning: Could not check GPU acceleration status")
+
+    def add_listener(self, tinglovchi):
+        self.tinglovchilar.append(tinglovchi)
+
+    def emit(self, turi, kamera=None, **maydonlar):
+        hodisa = RecognitionEvent(turi, kamera.nomi if kamera is not None else None, **maydonlar)
+        for tinglovchi in self.tinglovchilar:
+            try:
+                tinglovchi(hodisa)
+            except Exception as e:
+                print("Hodisa tinglovchisida xatolik:", e)
+
+    def set_status(self, kamera, matn):
+        """Kamera holatini yangilash; faqat o'zgarganda hodisa chiqariladi"""
+        if kamera.holat != matn:
+            kamera.holat = matn
+            self.emit("holat", kamera, matn=matn)
+
+    def start(self):
+        """Kameralarni ochib, pipeline ni ishga tushirish"""
+        if self.running:
+            return True
+
+        # Disk keshi (yoki birinchi marta to'liq yuklash), keyin faqat o'zgarishlar
+        self.gallery_sync.sync()
+        self.gallery_sync.start()
+        if not self.cameras.ochish():
+            return False
+
+        if self.executor is None:
+            self.executor = self.create_executor()
+        self.running = True
+
+        # Start processing pipeline: ushlash -> aniqlash -> kodlash -> yakunlash
+        self.pipeline = FramePipeline(
+            self.cameras,
+            tayyorlash=self.prepare_stage,
+            aniqlash=self.detect_stage,
+            kodlash=self.encode_stage,
+            yakunlash=self.finish_stage,
+            executor=self.executor,
+            max_parallel=self.workers * 2,
+            tashlanganda=self.release_job,
+            olchovchi=self.stride.olchov
+        )
+        self.pipeline.start()
+        if self.kadrlarni_uzatish:
+            self._ekran_thread = threading.Thread(target=self._ekran_ishlash, daemon=True)
+            self._ekran_thread.start()
+        return True
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        if self.pipeline:
+            self.pipeline.stop()
+            self.pipeline = None
+        if self._ekran_thread is not None:
+            self._ekran_thread.join(2.0)
+            self._ekran_thread = None
+        for halqa in self.frame_rings.values():
+            halqa.close()
+        self.frame_rings = {}
+        self.cameras.yopish()
+
+        # Navbatdagi kirish loglarini bazaga yozish
+        self.log_writer.flush()
+
+    def close(self):
+        """To'xtatib, loglarni yozish, keshni saqlash va ulanishlarni yopish"""
+        self.stop()
+        self.gallery_sync.stop()
+        self.gallery_sync.save_cache()
+        self.log_writer.stop()
+        self.face_db.ulanishni_yopish()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def create_executor(self):
+        """Aniqlash va kodlash uchun iliq ishchilar puli"""
+        if self.backend == "thread":
+            return ThreadPoolExecutor(max_workers=self.workers, initializer=_ishchini_boshlash)
+        # Oqimlari bor jarayondan fork qilish xavfli, shuning uchun forkserver/spawn
+        usul = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context(usul),
+            initializer=_ishchini_boshlash
+        )
+
+    def prepare_stage(self, element):
+        """Tayyorlash bosqichi: kadrni kichraytirish va aniqlash ishini tuzish"""
+        kamera, frame = element
+        if kamera.harakat is not None and not kamera.harakat.ochiqmi(frame):
+            # Harakatsiz sahna - eski izohlar olib tashlanadi, ekran baribir ko'rsatadi
+            kamera.izohlar = []
+            kamera.harakat_yopiq = True
+            self.set_status(kamera, "Harakat yo'q")
+            return None
+        if kamera.harakat_yopiq:
+            # Darvoza yopiq paytda treklar eskirmagan - qayta ochilganda yangidan boshlanadi
+            kamera.harakat_yopiq = False
+            if kamera.tracker:
+                kamera.tracker.reset()
+        if not self.stride.tanlash(kamera):
+            return None
+        frame = cv2.flip(frame, 1)
+        small_frame = cv2.resize(frame, (0, 0), fx=0.5, fy=0.5)
+        rgb_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+
+        if self.backend == "process":
+            # Kadr ishchilarga pickle qilinmasdan umumiy xotira orqali uzatiladi
+            halqa = self.frame_rings.get(kamera.nomi)
+            if halqa is None or halqa.shakl != rgb_frame.shape:
+                if halqa is not None:
+                    # Eski halqadagi kadrlar hali ishchilarda bo'lishi mumkin
+                    halqa.yopishni_rejalash()
+                halqa = self.frame_rings[kamera.nomi] = SharedFrameRing(rgb_frame.shape, self.workers * 4 + 6)
+            manba = halqa.yozish(rgb_frame)
+            if manba is None:
+                return None
+            job = RecognitionJob(kamera, frame, manba, halqa)
+        else:
+            job = RecognitionJob(kamera, frame, rgb_frame)
+
+        # Detect faces (yarim o'lchamli kadrda)
+        return job, (_yuzlarni_aniqlash, job.kadr_manbai, "cnn" if self.gpu_enabled else "hog",
+                     self.detector)
+
+    def detect_stage(self, job, small_locations):
+        """Aniqlash bosqichi: topilgan yuzlarni treklash va kodlanadiganlarini tanlash"""
+        job.small_locations = small_locations
+        job.face_locations = [(t*2, r*2, b*2, l*2) for (t, r, b, l) in small_locations]
+        face_count = len(small_locations)
+        job.tracks = [None] * face_count
+        tracker = job.kamera.tracker
+        if tracker:
+            job.tracks = tracker.update(job.face_locations, job.kadr_raqami)
+
+        if face_count == 0 or (face_count > 1 and not self.multi_face):
+            return job
+
+        # Tanilgan treklar uchun oldingi natija ishlatiladi, faqat qolganlari kodlanadi
+        for i, trek in enumerate(job.tracks):
+            if trek is None:
+                job.kodlanadigan.append(i)
+            elif trek.kutilmoqda:
+                job.kutilayotgan.append(i)
+            elif tracker.needs_verification(trek) or trek.face_id not in self.gallery:
+                # Galereyadan o'chirilgan shaxs ham qayta tekshiriladi
+                tracker.mark_pending(trek)
+                job.kodlanadigan.append(i)
+            else:
+                job.natijalar[i] = trek.face_id
+        return job
+
+    def encode_stage(self, job):
+        """Kodlash bosqichi: ishchi jarayonga yuboriladigan vazifa"""
+        if not job.kodlanadigan:
             return None
-        try:
-            with self.connection.cursor() as cursor:
-                cursor.execute(
-                    "SELECT first_name, last_name, created_at FROM face_data WHERE id = %s",
-                    (user_id,)
-                )
-                result = cursor.fetchone()
-                if result:
-                    return {
-                        'ism': result[0] or "Mavjud emas",
-                        'familiya': result[1] or "Mavjud emas",
-                        'created_at': result[2].strftime("%Y-%m-%d %H:%M:%S") if result[2] else "Mavjud emas"
-                    }
-        except Exception as e:
-            print("Foydalanuvchi ma'lumotlarini olishda xatolik:", e)
-        
-        return None
+        # Kodlash kichik kadr koordinatalarida
+        return (_yuzlarni_kodlash, job.kadr_manbai, [job.small_locations[i] for i in job.kodlanadigan],
+                self.face_detector.rejim)
 
-    def barcha_yuzlarni_olish(self):
-        if not self.ulanish():
-            return [], []
+    def finish_stage(self, job, face_encodings):
+        """Yakunlash bosqichi: tanish, loglash, chizish va ekranga uzatish"""
         try:
-            cursor = self.connection.cursor()
-            cursor.execute("SELECT id, encoding FROM face_data")
-            qatorlar = cursor.fetchall()
-            yuz_ids = []
-            yuz_kodlari = []
-            for qator in qatorlar:
-                yuz_ids.append(qator[0])
-                yuz_kodlari.append(np.array(qator[1]))
-            return yuz_ids, yuz_kodlari
+            self.recognize_faces(job, face_encodings or [])
         except Exception as e:
-            print(f"Xatolik: {e}")
-            return [], []
+            print("Xatolik:", e)
         finally:
-            self.ulanishni_yopish()
+            self.release_job(job)
 
-    def kirishni_loglash(self, yuz_id):
-        if not self.ulanish():
-            return False
-        try:
-            cursor = self.connection.cursor()
-            cursor.execute(
-                sql.SQL("INSERT INTO face_log_data (id_name) VALUES (%s)"),
-                (yuz_id,)
-            )
-            self.connection.commit()
-            return True
-        except Exception as e:
-            print(f"Log yozishda xatolik: {e}")
-            return False
-        finally:
-            self.ulanishni_yopish()
+        # Ekran oqimi keyingi kadrlarga shu izohlarni chizadi
+        job.kamera.izohlar = job.izohlar
 
-    def foydalanuvchi_malumotlari(self):
-        if not self.ulanish():
-            return []
-        try:
-            cursor = self.connection.cursor()
-            cursor.execute("""
-                SELECT 
-                    fd.id,
-                    fd.first_name,
-                    fd.last_name,
-                    to_char(fd.created_at, 'YYYY-MM-DD HH24:MI:SS') as created_at,
-                    to_char(MAX(fl.entry_time), 'YYYY-MM-DD HH24:MI:SS') as last_entry
-                FROM face_data fd
-                LEFT JOIN face_log_data fl ON fd.id = fl.id_name
-                GROUP BY fd.id, fd.created_at
-                ORDER BY fd.id DESC
-            """)
-            rows = cursor.fetchall()
-            return rows
-        except Exception as e:
-            print(f"Xatolik: {e}")
-            return []
-        finally:
-            self.ulanishni_yopish()
+    def _ekran_ishlash(self):
+        """Har bir olingan kadrni oxirgi izohlar bilan ekranga uzatish (tanish qadamidan mustaqil)"""
+        while self.running:
+            kadrlar = self.cameras.display_frames(timeout=0.5)
+            for kamera, frame in kadrlar:
+                frame = cv2.flip(frame, 1)
+                for location, matn in kamera.izohlar:
+                    if location is None:
+                        self.draw_status(frame, matn)
+                    else:
+                        self.draw_face(frame, location, matn)
+                kamera.oxirgi_kadr = frame
+            if kadrlar:
+                self.publish_frame()
 
-    def update_user_info(self, user_id, ism, familiya):
-        """Foydalanuvchi ism va familiyasini yangilash"""
-        if not self.ulanish():
-            return False
+    def publish_frame(self):
+        """Faqat eng oxirgi kadr ko'rsatiladi (bir nechta kamerada - to'r ko'rinishida)"""
+        frame = self.cameras.mozaika()
         try:
-            cursor = self.connection.cursor()
-            cursor.execute(
-                "UPDATE face_data SET first_name = %s, last_name = %s WHERE id = %s",
-                (ism, familiya, user_id)
-            )
-            self.connection.commit()
-            cursor.close()
-            return True
-        except Exception as e:
-            print(f"Ma'lumotlarni yangilashda xatolik: {e}")
-            self.connection.rollback()
-            return False
-
-    def foydalanuvchini_ochirish(self, face_id):
-        if not self.ulanish():
-            return False
+            self.frame_queue.get_nowait()
+        except queue.Empty:
+            pass
+        # Ikki bosqich bir vaqtda qo'yishi mumkin - to'lgan bo'lsa bu kadr tashlanadi
         try:
-            cursor = self.connection.cursor()
-            cursor.execute("DELETE FROM face_log_data WHERE id_name = %s", (face_id,))
-            cursor.execute("DELETE FROM face_data WHERE id = %s", (face_id,))
-            self.connection.commit()
-            return True
-        except Exception as e:
-            print(f"Xatolik: {e}")
-            return False
-        finally:
-            self.ulanishni_yopish()
+            self.frame_queue.put_nowait(frame)
+        except queue.Full:
+            pass
 
-    def get_user_image(self, face_id):
-        if not self.ulanish():
+    def release_job(self, job):
+        """Tashlangan yoki tugagan vazifadagi treklarni kutish holatidan chiqarish"""
+        for i in job.kodlanadigan:
+            if i < len(job.tracks) and job.tracks[i] is not None:
+                job.kamera.tracker.release(job.tracks[i])
+        if job.halqa is not None:
+            job.halqa.ozod_qilish(job.kadr_manbai)
+            job.halqa = None
+
+    def recognize_faces(self, job, face_encodings):
+        """Kadrdagi yuzlarni tanish, loglash, ekran izohlarini yig'ish va hodisalarni chiqarish"""
+        kamera = job.kamera
+        frame = job.frame
+        face_locations = job.face_locations
+        tracks = job.tracks
+        face_count = len(face_locations)
+
+        if face_count == 0:
+            # Yuz topilmasa
+            job.izohlar.append((None, "Yuz topilmadi"))
+            self.set_status(kamera, "Yuz topilmadi")
+            return
+
+        if face_count > 1 and not self.multi_face:
+            # Ko'p yuz topilgan
+            job.izohlar.append((None, f"Ogohlantirish: {face_count} ta yuz aniqlandi!"))
+            self.set_status(kamera, f"{face_count} ta yuz aniqlandi!")
+            return
+
+        natijalar = dict(job.natijalar)
+
+        # Check face orientation
+        yuzlar = []
+        for i, (face_encoding, nuqtalar) in zip(job.kodlanadigan, face_encodings):
+            top, right, bottom, left = face_locations[i]
+            if self.face_detector.detect(frame[top:bottom, left:right], nuqtalar):
+                yuzlar.append((i, face_encoding, nuqtalar))
+            elif tracks[i] is not None and tracks[i].face_id is not None:
+                # Qayta tekshiruv muvaffaqiyatsiz - keyingi kadrda yana urinib ko'riladi
+                natijalar[i] = tracks[i].face_id
+            else:
+                job.izohlar.append((face_locations[i], "Yuz holati noto'g'ri"))
+
+        for i in job.kutilayotgan:
+            job.izohlar.append((face_locations[i], "..."))
+
+        if not yuzlar and not natijalar:
+            if job.kutilayotgan:
+                return
+            if face_count == 1:
+                job.izohlar.append((None, "Yuz holati noto'g'ri"))
+            self.set_status(kamera, "Yuz holati noto'g'ri")
+            return
+
+        # Compare with known faces - barcha yuzlar uchun bitta vektorlashtirilgan hisob
+        if yuzlar:
+            face_ids, distances = self.gallery.search([yuz[1] for yuz in yuzlar])
+        else:
+            face_ids, distances = [], []
+
+        for (i, face_encoding, nuqtalar), face_id, distance in zip(yuzlar, face_ids, distances):
+            if distance < 0.5:
+                face_id = int(face_id)
+            else:
+                # Add new face if unknown - eng sifatli kadr tanlanguncha nomzodlar yig'iladi
+                face_id = self.enroll_candidate(kamera, tracks[i], frame, face_locations[i],
+                                                face_encoding, nuqtalar)
+            natijalar[i] = face_id
+            if tracks[i] is not None:
+                kamera.tracker.set_identity(tracks[i], face_id)
+
+        tanilganlar = []
+        for i, face_id in sorted(natijalar.items()):
+            job.izohlar.append((face_locations[i], f"ID-{face_id}" if face_id is not None else "Noma'lum shaxs!"))
+            if face_id is not None:
+                tanilganlar.append((face_locations[i], face_id))
+
+        if not tanilganlar:
+            if kamera.joriy_id is not None:
+                kamera.joriy_id = None
+                self.emit("nomalum", kamera)
+            self.set_status(kamera, "Noma'lum shaxs!")
+            name = "Noma'lum shaxs!"
+        else:
+            # Asosiy shaxs - eng katta (kameraga eng yaqin) yuz
+            _, face_id = max(tanilganlar, key=lambda t: (t[0][2] - t[0][0]) * (t[0][1] - t[0][3]))
+            # Yangi shaxs aniqlangan bo'lsa, tinglovchilarga xabar berish
+            if kamera.joriy_id != face_id:
+                kamera.joriy_id = face_id
+                self.emit("tanildi", kamera, face_id=face_id)
+            self.set_status(kamera, "Tanildi")
+            name = f"ID-{face_id}" if face_count == 1 else f"{len(tanilganlar)}/{face_count} ta yuz tanildi"
+
+        # Log entry if needed - har bir shaxs alohida loglanadi
+        for _, face_id in tanilganlar:
+            self.log_entry(face_id, kamera)
+
+        job.izohlar.append((None, name))
+
+    def enroll_candidate(self, kamera, trek, frame, location, face_encoding, nuqtalar):
+        """Noma'lum yuzni ro'yxatga olish; bufer yoqilgan bo'lsa eng yaxshi nomzod tanlanguncha None"""
+        top, right, bottom, left = location
+        # Bufer qirqimni kadrdan uzoqroq saqlaydi, shuning uchun nusxalanadi
+        rasm = frame[top:bottom, left:right].copy()
+        if self.enrollment is not None:
+            if trek is not None:
+                kalit = (kamera.nomi, trek.trek_id)
+            else:
+                kalit = self.enrollment.kalit_top(kamera.nomi, face_encoding)
+            baho = EnrollmentBuffer.baholash(rasm, self.face_detector.frontallik(nuqtalar))
+            tanlangan = self.enrollment.add(kalit, rasm, face_encoding, baho)
+            if tanlangan is None:
+                return None
+            rasm, face_encoding = tanlangan
+            # Kutish davomida boshqa kamera orqali yozilgan bo'lishi mumkin
+            mavjud, _ = self.gallery.match(face_encoding, self.enrollment.tolerance)
+            if mavjud is not None:
+                return mavjud
+
+        face_id = self.face_db.yuz_qoshish(rasm, face_encoding)
+        if not face_id:
             return None
+        self.gallery.add(face_id, face_encoding)
+        self.last_log_times[face_id] = datetime.now()
+        self.emit("yangi", kamera, face_id=face_id)
+        return face_id
+
+    def log_entry(self, face_id, kamera=None):
+        """Kirishni loglash (bir odam uchun 30 soniyada bir marta)"""
+        needs_log = (
+            face_id not in self.last_log_times or
+            (datetime.now() - self.last_log_times[face_id]).total_seconds() >= 30
+        )
+
+        if needs_log:
+            kirish_vaqti = datetime.now()
+            self.log_writer.log(face_id, kirish_vaqti)
+            self.last_log_times[face_id] = kirish_vaqti
+            self.emit("kirish", kamera, face_id=face_id, vaqt=kirish_vaqti)
+
+    def draw_face(self, frame, location, name):
+        """Yuz atrofiga to'rtburchak va uning ostiga yorliq chizish"""
+        top, right, bottom, left = location
+        cv2.rectangle(frame, (left, top), (right, bottom), (0, 0, 255), 2)
+        cv2.putText(frame, name, (left, bottom + 25), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+
+    def draw_status(self, frame, matn):
+        """Kadrning yuqori chap burchagiga holat yozuvi"""
+        cv2.putText(frame, matn, (50, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+
+
+def run_headless(engine):
+    """Dvigatelni ekransiz ishga tushirish; hodisalar stdout ga JSON qatorlar bo'lib yoziladi"""
+    toxtash = threading.Event()
+    engine.add_listener(lambda hodisa: print(json.dumps(hodisa.as_dict(), ensure_ascii=False), flush=True))
+    signal.signal(signal.SIGTERM, lambda *_: toxtash.set())
+    if not engine.start():
+        print("Kamerani ochib bo'lmadi!")
+        engine.close()
+        return 1
+    try:
+        while not toxtash.wait(1.0):
+            pass
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.close()
+    return 0
+
+# Batch Processing
+RASM_KENGAYTMALARI = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+def _kadrdagi_yuzlar(kadr, manba, model, rasm_kerak, rasm_fayli=False, max_olcham=1024):
+    """Ishchida bajariladi: BGR kadrdagi yuzlar (manba, joy, kod, (jpeg, thumb) yoki None, yakka)
+
+    joy asl kadr koordinatalarida; yakka - yuz alohida rasm faylidagi yagona yuz.
+    """
+    masshtab = max_olcham / max(kadr.shape[:2])
+    kichik = kadr
+    if masshtab < 1:
+        kichik = cv2.resize(kadr, (0, 0), fx=masshtab, fy=masshtab, interpolation=cv2.INTER_AREA)
+    else:
+        masshtab = 1.0
+    rgb = cv2.cvtColor(kichik, cv2.COLOR_BGR2RGB)
+    joylar = face_recognition.face_locations(rgb, model=model)
+    kodlar = face_recognition.face_encodings(rgb, joylar)
+    yakka = rasm_fayli and len(joylar) == 1
+    h, w = kadr.shape[:2]
+    natijalar = []
+    for joy, kod in zip(joylar, kodlar):
+        # Kichraytirilgan kadrdagi joyni asl kadrga qaytarish
+        top, right, bottom, left = (int(round(k / masshtab)) for k in joy)
+        top, left = max(0, top), max(0, left)
+        bottom, right = min(h, bottom), min(w, right)
+        rasmlar = None
+        if rasm_kerak:
+            qirqim = kadr[top:bottom, left:right]
+            ok, buffer = cv2.imencode(".jpg", qirqim)
+            if ok:
+                rasmlar = (buffer.tobytes(), FaceDB._thumbnail_yaratish(qirqim))
+        natijalar.append((manba, (top, right, bottom, left), kod, rasmlar, yakka))
+    return natijalar
+
+
+def _rasmlarni_ishlash(yollar, model, rasm_kerak):
+    """Ishchida bajariladi: rasm fayllari paketini o'qib, yuzlarni topish va kodlash"""
+    natijalar = []
+    for yol in yollar:
+        kadr = cv2.imread(yol)
+        if kadr is None:
+            print(f"Rasmni o'qib bo'lmadi: {yol}")
+            continue
+        natijalar.extend(_kadrdagi_yuzlar(kadr, yol, model, rasm_kerak, rasm_fayli=True))
+    return natijalar
+
+
+def _video_qismini_ishlash(yol, boshlanish, tugash, qadam, model, rasm_kerak):
+    """Ishchida bajariladi: videoning [boshlanish, tugash) oralig'idagi har qadam-kadrni ishlash"""
+    video = cv2.VideoCapture(yol)
+    video.set(cv2.CAP_PROP_POS_FRAMES, boshlanish)
+    natijalar = []
+    try:
+        for raqam in range(boshlanish, tugash):
+            if (raqam - boshlanish) % qadam:
+                # grab() kadrni baribir o'qiydi va (FFmpeg'da) dekodlaydi; faqat
+                # retrieve, rangga o'tkazish va yuz aniqlash o'tkazib yuboriladi
+                if not video.grab():
+                    break
+                continue
+            ret, kadr = video.read()
+            if not ret:
+                break
+            natijalar.extend(_kadrdagi_yuzlar(kadr, f"{yol}#{raqam}", model, rasm_kerak))
+    finally:
+        video.release()
+    return natijalar
+
+
+class BatchProcessor:
+    """Rasmlar papkasi yoki video fayldan oflayn ro'yxatga olish va tanish
+
+    Aniqlash/kodlash ishchi jarayonlarda parallel bajariladi; ro'yxatga olishda
+    yuzlar mavjud galereya va paketning o'zi bilan solishtirilib takrorlari
+    tashlanadi, yangilari esa COPY bilan paketlab yoziladi.
+    """
+
+    def __init__(self, face_db, workers=None, tolerance=0.5, qadam=5,
+                 paket_hajmi=500, model="hog"):
+        self.face_db = face_db
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.tolerance = tolerance
+        # Videoda har nechanchi kadr ishlanadi
+        self.qadam = max(1, qadam)
+        self.paket_hajmi = paket_hajmi
+        self.model = model
+        self.gallery = GalleryIndex()
+        # Oxirgi ishda bazaga yozilmagan yuzlar soni (xatolik bo'lsa > 0)
+        self.xatolar = 0
+
+    def _ishlar(self, yol, rasm_kerak):
+        """Manbani ishchilarga beriladigan (funksiya, *argumentlar) bo'laklariga ajratish"""
+        if os.path.isdir(yol):
+            fayllar = sorted(
+                os.path.join(papka, nom)
+                for papka, _, nomlar in os.walk(yol)
+                for nom in nomlar if nom.lower().endswith(RASM_KENGAYTMALARI)
+            )
+            for i in range(0, len(fayllar), 16):
+                yield (_rasmlarni_ishlash, fayllar[i:i + 16], self.model, rasm_kerak)
+            return
+        video = cv2.VideoCapture(yol)
+        kadrlar_soni = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+        video.release()
+        if kadrlar_soni <= 0:
+            # Video emas - bitta rasm fayli sifatida
+            yield (_rasmlarni_ishlash, [yol], self.model, rasm_kerak)
+            return
+        # Har bir ishchi videoni o'zi ochib, o'z bo'lagiga o'tadi - kadrlar uzatilmaydi
+        bolak = self.qadam * 60
+        for boshlanish in range(0, kadrlar_soni, bolak):
+            yield (_video_qismini_ishlash, yol, boshlanish, min(boshlanish + bolak, kadrlar_soni),
+                   self.qadam, self.model, rasm_kerak)
+
+    def _yuzlar(self, yol, rasm_kerak):
+        """Barcha yuzlarni ishchilardan manba tartibida olish"""
+        usul = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        with ProcessPoolExecutor(max_workers=self.workers,
+                                 mp_context=multiprocessing.get_context(usul)) as executor:
+            ishlar = self._ishlar(yol, rasm_kerak)
+            jarayonda = deque()
+            # Xotira cheklangan bo'lishi uchun bir vaqtda ishchilar sonidan 2 baravar ko'p ish
+            for ish in ishlar:
+                jarayonda.append(executor.submit(*ish))
+                if len(jarayonda) >= self.workers * 2:
+                    yield from self._natija(jarayonda.popleft())
+            while jarayonda:
+                yield from self._natija(jarayonda.popleft())
+
+    def _natija(self, future):
         try:
-            cursor = self.connection.cursor()
-            cursor.execute("SELECT img FROM face_data WHERE id = %s", (face_id,))
-            row = cursor.fetchone()
-            return row[0] if row else None
+            return future.result()
         except Exception as e:
-            print(f"Xatolik: {e}")
-            return None
-        finally:
-            self.ulanishni_yopish()
+            print("Ishchida xatolik:", e)
+            return []
 
-# Face Orientation Detector
-class FaceOrientationDetector:
-    def __init__(self):
-        self.mp_face_mesh = mp.solutions.face_mesh
-        self.face_mesh = self.mp_face_mesh.FaceMesh(static_image_mode=False, max_num_faces=1, refine_landmarks=True)
+    @staticmethod
+    def _ism_familiya(manba, yakka):
+        """Yagona yuzli Ism_Familiya.jpg nomidan ism va familiya; aks holda standart qiymat
 
-    def detect(self, frame):
-        h, w, _ = frame.shape
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.face_mesh.process(frame_rgb)
+        Video kadrlari, guruh rasmlari va IMG_1234.jpg kabi nomlar nomlanmaydi.
+        """
+        nom = os.path.splitext(os.path.basename(manba))[0]
+        if yakka and "_" in nom:
+            ism, familiya = nom.split("_", 1)
+            qismlar = [ism] + familiya.split("_")
+            if all(q.replace("'", "").replace("-", "").isalpha() for q in qismlar):
+                return ism, " ".join(qismlar[1:])
+        return "Aniqlanmagan!", "Aniqlanmagan!"
 
-        if not results.multi_face_landmarks:
-            return False
+    def enroll(self, yol, natija_fayli=None):
+        """Manbadagi yangi yuzlarni bazaga qo'shish; qo'shilganlar soni"""
+        self.gallery.reset(*self.face_db.barcha_yuzlarni_olish())
+        self.xatolar = 0
+        navbat = []
+        qatorlar = []
+        # Manfiy vaqtinchalik id -> shu ishda qo'shilgan yuzning qatori
+        yangilar = {}
+        qoshildi = takrorlar = 0
+        vaqtincha_id = 0
 
-        landmarks = results.multi_face_landmarks[0].landmark
+        def yozish():
+            nonlocal qoshildi
+            idlar = self.face_db.yuzlarni_kopiyalash([yozuv for yozuv, _, _ in navbat])
+            if len(idlar) != len(navbat):
+                # Paket yozilmadi - bu yuzlar keyingi fayllarda qayta urinib ko'riladi
+                self.xatolar += len(navbat)
+                for _, qator, vaqtinchalik in navbat:
+                    qator[2] = "xato"
+                    self.gallery.remove(vaqtinchalik)
+            else:
+                for yuz_id, (_, qator, _) in zip(idlar, navbat):
+                    qator[3] = yuz_id
+                qoshildi += len(idlar)
+            navbat.clear()
 
-        left_eye = landmarks[33]
-        right_eye = landmarks[263]
-        nose = landmarks[1]
+        for manba, joy, kod, rasmlar, yakka in self._yuzlar(yol, rasm_kerak=True):
+            yuz_id, masofa = self.gallery.match(kod, self.tolerance)
+            if yuz_id is not None:
+                takrorlar += 1
+                # Manfiy id - shu ishda avvalroq qo'shilgan yuz; haqiqiy id oxirida qo'yiladi
+                qatorlar.append([manba, joy, "takror", yuz_id, masofa])
+                continue
+            if rasmlar is None:
+                continue
+            vaqtincha_id -= 1
+            self.gallery.add(vaqtincha_id, kod)
+            qator = [manba, joy, "yangi", None, None]
+            qatorlar.append(qator)
+            yangilar[vaqtincha_id] = qator
+            ism, familiya = self._ism_familiya(manba, yakka)
+            jpeg, thumb = rasmlar
+            navbat.append(((jpeg, kod, ism, familiya, thumb), qator, vaqtincha_id))
+            if len(navbat) >= self.paket_hajmi:
+                yozish()
+        if navbat:
+            yozish()
 
-        left_eye_x = left_eye.x * w
-        right_eye_x = right_eye.x * w
-        left_eye_y = left_eye.y * h
-        right_eye_y = right_eye.y * h
-        nose_x = nose.x * w
-        nose_y = nose.y * h
+        for qator in qatorlar:
+            if qator[2] == "takror" and qator[3] < 0:
+                asl = yangilar[qator[3]]
+                # Asl yuz yozilmagan bo'lsa bu takror ham bazada yo'q
+                qator[2] = "xato" if asl[2] == "xato" else "takror"
+                qator[3] = asl[3]
 
-        eye_width = abs(right_eye_x - left_eye_x)
-        eye_x_center = (left_eye_x + right_eye_x) / 2
-        nose_x_offset = abs(nose_x - eye_x_center)
-        yaw_ok = nose_x_offset < eye_width * 0.08
+        if natija_fayli:
+            self._natijalarni_yozish(natija_fayli, qatorlar)
+        print(f"Qo'shildi: {qoshildi}, takrorlar: {takrorlar}"
+              + (f", yozilmadi: {self.xatolar}" if self.xatolar else ""))
+        return qoshildi
 
-        eye_y_avg = (left_eye_y + right_eye_y) / 2
-        vertical_dist = abs(nose_y - eye_y_avg)
-        vertical_ratio = vertical_dist / eye_width
-        pitch_ok = 0.3 < vertical_ratio < 0.6
+    def recognize(self, yol, natija_fayli):
+        """Manbadagi yuzlarni faqat tanish va natijalarni CSV faylga yozish"""
+        self.gallery.reset(*self.face_db.barcha_yuzlarni_olish())
+        qatorlar = []
+        for manba, joy, kod, _, _ in self._yuzlar(yol, rasm_kerak=False):
+            yuz_id, masofa = self.gallery.match(kod, self.tolerance)
+            qatorlar.append([manba, joy, "tanildi" if yuz_id is not None else "noma'lum", yuz_id, masofa])
+        self._natijalarni_yozish(natija_fayli, qatorlar)
+        print(f"Jami {len(qatorlar)} ta yuz, natijalar: {natija_fayli}")
+        return len(qatorlar)
 
-        return yaw_ok and pitch_ok
+    @staticmethod
+    def _natijalarni_yozish(natija_fayli, qatorlar):
+        with open(natija_fayli, "w", newline="", encoding="utf-8") as f:
+            yozuvchi = csv.writer(f)
+            yozuvchi.writerow(["manba", "top", "right", "bottom", "left", "holat", "face_id", "masofa"])
+            for manba, joy, holat, yuz_id, masofa in qatorlar:
+                yozuvchi.writerow([manba, *joy, holat, "" if yuz_id is None else yuz_id,
+                                   "" if masofa is None or np.isinf(masofa) else f"{masofa:.4f}"])
 
 # Login Window
 class LoginWindow:
@@ -392,18 +3566,22 @@ class LoginWindow:
         else:
             messagebox.showerror("Xatolik", "Noto'g'ri login yoki parol!", parent=self.window)
 
-# Users Window
-import tkinter as tk
-from tkinter import ttk, messagebox
-from ttkbootstrap import Style
-from PIL import Image, ImageTk
-import io
-
 # Users Window
 class UsersWindow:
+    # Bitta so'rovda olinadigan qatorlar soni
+    SAHIFA_HAJMI = 200
+
     def __init__(self, parent, face_db):
         self.parent = parent
         self.face_db = face_db
+        # Sahifalar fon oqimida olinadi va shu navbat orqali Tk oqimiga beriladi
+        self.sahifalar = queue.Queue()
+        self.qidiruv = ""
+        self._avlod = 0
+        self._oxirgi_id = None
+        self._yuklanmoqda = False
+        self._tugadi = False
+        self._qidiruv_kechiktirish = None
         self.window = tk.Toplevel(parent)
         self.window.title("Foydalanuvchilar boshqaruvi")
         self.window.minsize(1080, 720)
@@ -436,6 +3614,14 @@ class UsersWindow:
         title_frame = ttk.Frame(header_frame)
         title_frame.pack(side=tk.LEFT)
 
+        # Search - ism, familiya yoki ID bo'yicha
+        search_frame = ttk.Frame(header_frame)
+        search_frame.pack(side=tk.RIGHT)
+        ttk.Label(search_frame, text="Qidirish:").pack(side=tk.LEFT, padx=(0, 5))
+        self.search_entry = ttk.Entry(search_frame, width=30)
+        self.search_entry.pack(side=tk.LEFT)
+        self.search_entry.bind("<KeyRelease>", self.on_search)
+
         # Title as LabelFrame style for Treeview
         table_frame = ttk.LabelFrame(
             main_container,
@@ -463,7 +3649,7 @@ class UsersWindow:
             command=self.tree.yview,
             style="primary"
         )
-        self.tree.configure(yscrollcommand=vsb.set)
+        self.tree.configure(yscrollcommand=lambda first, last: self.on_tree_scroll(vsb, first, last))
 
         # Horizontal scrollbar
         hsb = ttk.Scrollbar(
@@ -631,9 +3817,6 @@ class UsersWindow:
         )
         delete_btn.pack(side=tk.LEFT, fill=tk.X, padx=(5, 0))
         
-        # Load initial data
-        self.load_users()
-        
         # Center the window
         self.center_window(1080, 720)
         
@@ -641,6 +3824,10 @@ class UsersWindow:
         self.window.transient(parent)
         self.window.grab_set()
 
+        # Load initial data - oyna darhol ochiladi, qatorlar fon oqimidan keladi
+        self.load_users()
+        self.handle_pages()
+
     def center_window(self, width, height):
         """Oynani ekranning markazida ochish"""
         self.window.update_idletasks()
@@ -651,23 +3838,76 @@ class UsersWindow:
         self.window.geometry(f"{width}x{height}+{x}+{y}")
     
     def load_users(self):
-        users = self.face_db.foydalanuvchi_malumotlari()
-        
+        """Ro'yxatni boshidan yuklash (joriy qidiruv bilan)"""
+        # Eski so'rovlar natijasi avlod raqami orqali e'tiborsiz qoldiriladi
+        self._avlod += 1
+        self._oxirgi_id = None
+        self._yuklanmoqda = False
+        self._tugadi = False
+
         # Clear existing data
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        # Add new data with proper handling of empty values
-        for user in users:
-            # Convert None values to empty strings and handle empty values
-            processed_values = []
-            for value in user:
-                if value is None:
-                    processed_values.append("")
-                else:
-                    processed_values.append(value)
-            
-            self.tree.insert("", tk.END, values=processed_values)
+        self.tree.delete(*self.tree.get_children())
+        self.load_next_page()
+
+    def load_next_page(self):
+        """Keyingi sahifani fon oqimida so'rash"""
+        if self._yuklanmoqda or self._tugadi:
+            return
+        self._yuklanmoqda = True
+        threading.Thread(
+            target=self._sahifani_olish,
+            args=(self._avlod, self.qidiruv, self._oxirgi_id),
+            daemon=True
+        ).start()
+
+    def _sahifani_olish(self, avlod, qidiruv, oxirgi_id):
+        users = self.face_db.foydalanuvchilar_sahifasi(qidiruv, oxirgi_id, self.SAHIFA_HAJMI)
+        self.sahifalar.put((avlod, users))
+
+    def handle_pages(self):
+        """Tayyor sahifalarni Tk oqimida jadvalga qo'shish"""
+        if not self.window.winfo_exists():
+            return
+        while True:
+            try:
+                avlod, users = self.sahifalar.get_nowait()
+            except queue.Empty:
+                break
+            if avlod != self._avlod:
+                continue
+            self._yuklanmoqda = False
+            self._tugadi = len(users) < self.SAHIFA_HAJMI
+
+            # Add new data with proper handling of empty values
+            for user in users:
+                # Convert None values to empty strings and handle empty values
+                processed_values = ["" if value is None else value for value in user]
+                self.tree.insert("", tk.END, values=processed_values)
+            if users:
+                self._oxirgi_id = users[-1][0]
+            # Sahifa jadvalni to'ldirmagan bo'lsa, keyingisi ham olinadi
+            if not self._tugadi and self.tree.yview()[1] >= 0.9:
+                self.load_next_page()
+        self.window.after(50, self.handle_pages)
+
+    def on_tree_scroll(self, scrollbar, first, last):
+        """Ro'yxat oxiriga yaqinlashganda keyingi sahifani yuklash"""
+        scrollbar.set(first, last)
+        if float(last) >= 0.9:
+            self.load_next_page()
+
+    def on_search(self, event):
+        """Qidiruv matni o'zgarganda (kichik kechikish bilan) ro'yxatni qayta yuklash"""
+        if self._qidiruv_kechiktirish is not None:
+            self.window.after_cancel(self._qidiruv_kechiktirish)
+        self._qidiruv_kechiktirish = self.window.after(300, self._qidiruvni_qollash)
+
+    def _qidiruvni_qollash(self):
+        self._qidiruv_kechiktirish = None
+        qidiruv = self.search_entry.get().strip()
+        if qidiruv != self.qidiruv:
+            self.qidiruv = qidiruv
+            self.load_users()
     
     def on_tree_select(self, event):
         selected = self.tree.selection()
@@ -677,8 +3917,8 @@ class UsersWindow:
         item = self.tree.item(selected[0])
         user_id = item['values'][0]
         
-        # Get user image
-        img_bytes = self.face_db.get_user_image(user_id)
+        # Get user thumbnail
+        img_bytes = self.face_db.get_user_thumbnail(user_id)
         
         if img_bytes:
             try:
@@ -905,8 +4145,84 @@ class UsersWindow:
                 )
 
 
+# Frame Renderer
+class FrameRenderer:
+    """Ko'rsatiladigan kadrni asosiy (Tk) oqimdan tashqarida tayyorlash
+
+    Kadr cv2.resize bilan konteynerga moslanadi va RGB PIL rasmga aylantiriladi;
+    asosiy oqimga faqat tayyor rasmni bitta PhotoImage ga paste() qilish qoladi.
+    Chiqish tezligi fps bilan cheklanadi (tanish tezligidan mustaqil).
+    """
+
+    def __init__(self, navbat, fps=30):
+        self.navbat = navbat
+        self.oraliq = 1.0 / fps if fps and fps > 0 else 0
+        self.slot = LatestFrameSlot()
+        self._konteyner = None
+        # (kadr o'lchami, konteyner) -> moslashtirilgan o'lcham; konteyner o'zgarguncha saqlanadi
+        self._geometriya = (None, None, None)
+        self._toxtash = threading.Event()
+        self._thread = None
+
+    def set_target(self, kenglik, balandlik):
+        """Konteyner o'lchami (asosiy oqimdan, <Configure> hodisasida chaqiriladi)"""
+        if kenglik > 1 and balandlik > 1:
+            self._konteyner = (kenglik, balandlik)
+
+    def start(self):
+        self._toxtash.clear()
+        self.slot = LatestFrameSlot()
+        self._thread = threading.Thread(target=self._ishlash, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        self._toxtash.set()
+        self.slot.close()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _olcham(self, kenglik, balandlik):
+        """Proporsional moslashtirilgan o'lcham (geometriya keshi bilan)"""
+        kadr, konteyner, natija = self._geometriya
+        if kadr == (kenglik, balandlik) and konteyner == self._konteyner:
+            return natija
+        konteyner = self._konteyner
+        natija = (kenglik, balandlik)
+        if konteyner is not None:
+            container_width, container_height = konteyner
+            img_ratio = kenglik / balandlik
+            if container_width / container_height > img_ratio:
+                # Container wider than image
+                natija = (max(1, int(container_height * img_ratio)), container_height)
+            else:
+                # Container taller than image
+                natija = (container_width, max(1, int(container_width / img_ratio)))
+        self._geometriya = ((kenglik, balandlik), konteyner, natija)
+        return natija
+
+    def _ishlash(self):
+        keyingi = 0.0
+        while not self._toxtash.is_set():
+            try:
+                frame = self.navbat.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            hozir = time.monotonic()
+            if hozir < keyingi:
+                continue
+            keyingi = hozir + self.oraliq
+            balandlik, kenglik = frame.shape[:2]
+            olcham = self._olcham(kenglik, balandlik)
+            if olcham != (kenglik, balandlik):
+                usul = cv2.INTER_AREA if olcham[0] < kenglik else cv2.INTER_LINEAR
+                frame = cv2.resize(frame, olcham, interpolation=usul)
+            self.slot.put(Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)))
+
+
 class FaceRecognitionApp:
-    def __init__(self, root):
+    def __init__(self, root, face_db=None, multi_face=False, tracking=True,
+                 backend="process", workers=None, cameras=None, engine=None, display_fps=30):
         self.root = root
         self.style = Style(theme='morph')
         self.root.title("Yuzni tanib olish tizimi")
@@ -1009,30 +4325,33 @@ class FaceRecognitionApp:
         )
         self.stop_btn.pack(side=tk.LEFT, padx=10)
         
-        # Initialize face recognition
-        self.face_db = FaceDB("face_db", "postgres", "123", "localhost", "5432")
-        self.video_capture = None
-        self.known_face_ids = []
-        self.known_face_encodings = []
-        self.face_detector = FaceOrientationDetector()
-        self.last_log_times = {}
+        # Initialize face recognition - tanish mantiqi GUI'siz dvigatelda
+        self.engine = engine or RecognitionEngine(
+            face_db or FaceDB("face_db", "postgres", "123", "localhost", "5432"),
+            cameras=cameras,
+            multi_face=multi_face,
+            tracking=tracking,
+            backend=backend,
+            workers=workers,
+            kadrlarni_uzatish=True
+        )
+        self.face_db = self.engine.face_db
         self.running = False
-        self.frame_queue = queue.Queue(maxsize=1)
         self.current_user_id = None
+        # Dvigatel hodisalari shu navbat orqali asosiy (Tk) oqimga o'tkaziladi
+        self.hodisalar = queue.Queue()
+        self.engine.add_listener(self.hodisalar.put)
+        # Ekranga chiqarish tanishdan alohida, o'z FPS chegarasi bilan
+        self.display_fps = display_fps
+        self.renderer = FrameRenderer(self.engine.frame_queue, display_fps)
+        self.video_container.bind(
+            "<Configure>", lambda e: self.renderer.set_target(e.width, e.height)
+        )
+        self.photo = None
+        self.kadr_seq = 0
+        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
 
         self.clear_user_info()
-        
-        # Check for GPU acceleration
-        self.gpu_enabled = False
-        try:
-            import dlib
-            if dlib.DLIB_USE_CUDA:
-                self.gpu_enabled = True
-                print("GPU acceleration is enabled for face recognition")
-            else:
-                print("Warning: GPU acceleration not available for face recognition")
-        except:
-            print("Warning: Could not check GPU acceleration status")
             
     def setup_info_panel(self):
         """Foydalanuvchi ma'lumotlari panelini sozlash"""
@@ -1196,27 +4515,17 @@ class FaceRecognitionApp:
         if self.running:
             return
             
-        self.known_face_ids, self.known_face_encodings = self.face_db.barcha_yuzlarni_olish()
-        self.video_capture = cv2.VideoCapture(0)
-        
-        if not self.video_capture.isOpened():
+        if not self.engine.start():
             messagebox.showerror("Xatolik", "Kamerani ochib bo'lmadi!")
             return
         
-        if self.known_face_encodings:
-            self.known_face_encodings = np.array(self.known_face_encodings)
-            
         self.running = True
+        self.renderer.set_target(self.video_container.winfo_width(), self.video_container.winfo_height())
+        self.renderer.start()
+        self.kadr_seq = 0
         self.status_label.config(text="Holat: Yuzni aniqlash amalga oshirilyapti")
         self.user_status_label.config(text="Yuzni aniqlash...")
         
-        # Start processing thread
-        self.processing_thread = threading.Thread(
-            target=self.process_frames,
-            daemon=True
-        )
-        self.processing_thread.start()
-        
         # Start updating GUI
         self.update_frame()
     
@@ -1225,11 +4534,11 @@ class FaceRecognitionApp:
             return
             
         self.running = False
-        if self.video_capture:
-            self.video_capture.release()
-            self.video_capture = None
+        self.engine.stop()
+        self.renderer.stop()
             
         # Clear video display
+        self.photo = None
         blank = Image.new('RGB', (1080, 720), (217, 227, 241))
         blank_img = ImageTk.PhotoImage(blank)
         self.video_label.config(image=blank_img)
@@ -1237,188 +4546,63 @@ class FaceRecognitionApp:
         
         self.status_label.config(text="Holat: Tizim to'xtatilgan")
         self.user_status_label.config(text="Tizim to'xtatilgan")
-    
-    def process_frames(self):
-        while self.running:
-            ret, frame = self.video_capture.read()
-            if not ret:
-                continue
-                
-            frame = cv2.flip(frame, 1)
-            small_frame = cv2.resize(frame, (0, 0), fx=0.5, fy=0.5)
-            rgb_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
-            
+
+    def on_closing(self):
+        """Dasturdan chiqishda loglarni yozib, ulanishlarni yopish"""
+        self.stop_recognition()
+        self.engine.close()
+        self.root.destroy()
+
+    def handle_events(self):
+        """Dvigatel hodisalarini asosiy oqimda panelga qo'llash"""
+        while True:
             try:
-                # Detect faces
-                face_locations = face_recognition.face_locations(
-                    rgb_frame,
-                    model="cnn" if self.gpu_enabled else "hog"
-                )
-                face_locations = [(t*2, r*2, b*2, l*2) for (t, r, b, l) in face_locations]
+                hodisa = self.hodisalar.get_nowait()
+            except queue.Empty:
+                return
+            if hodisa.turi == "holat":
+                self.user_status_label.config(text=hodisa.matn)
+            elif hodisa.turi == "tanildi":
+                # Yangi foydalanuvchi aniqlangan bo'lsa, ma'lumotlarni yangilash
+                if self.current_user_id != hodisa.face_id:
+                    self.update_user_info(hodisa.face_id)
+                    self.current_user_id = hodisa.face_id
+            elif hodisa.turi == "nomalum":
+                self.clear_user_info()
+            elif hodisa.turi == "kirish" and self.current_user_id == hodisa.face_id:
+                # Oxirgi kirish vaqtini yangilash
+                self.user_last_entry_label.config(text=hodisa.vaqt.strftime("%Y-%m-%d %H:%M:%S"))
 
-                # Yuzlar sonini tekshirish
-                face_count = len(face_locations)
-                
-                name = "Yuz topilmadi"
-                if face_count==0:
-                    # Yuz topilmasa
-                    cv2.putText(frame, "Yuz topilmadi", (50, 50), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-                    self.user_status_label.config(text="Yuz topilmadi")
-                elif face_count==1:
-                    # Get face encodings
-                    face_encodings = face_recognition.face_encodings(
-                        rgb_frame,
-                        [face_locations[0]],
-                        num_jitters=1
-                    )
-                    
-                    if face_encodings:
-                        
-                        face_encoding = face_encodings[0]
-                        top, right, bottom, left = face_locations[0]
-                        
-                        # Check face orientation
-                        sub_frame = frame[top:bottom, left:right]
-                        orientation_ok = self.face_detector.detect(sub_frame)
-                        
-                        if not orientation_ok:
-                            name = "Yuz holati noto'g'ri"
-                            self.user_status_label.config(text="Yuz holati noto'g'ri")
-                        else:
-                            if len(self.known_face_encodings) > 0:
-                                # Compare with known faces
-                                distances = face_recognition.face_distance(
-                                    self.known_face_encodings, 
-                                    face_encoding
-                                )
-                                best_match = np.argmin(distances)
-                                
-                                if distances[best_match] < 0.5:
-                                    face_id = self.known_face_ids[best_match]
-                                    name = f"ID-{face_id}"
-                                    
-                                    # Yangi foydalanuvchi aniqlangan bo'lsa, ma'lumotlarni yangilash
-                                    if self.current_user_id != face_id:
-                                        self.update_user_info(face_id)
-                                        self.current_user_id = face_id
-                                    
-                                    # Log entry if needed
-                                    needs_log = (
-                                        face_id not in self.last_log_times or 
-                                        (datetime.now() - self.last_log_times[face_id]).total_seconds() >= 30
-                                    )
-                                    
-                                    if needs_log:
-                                        self.face_db.kirishni_loglash(face_id)
-                                        self.last_log_times[face_id] = datetime.now()
-                                        # Oxirgi kirish vaqtini yangilash
-                                        self.update_last_entry_time(face_id)
-                                else:
-                                    name = "Noma'lum shaxs!"
-                                    self.user_status_label.config(text="Noma'lum shaxs!")
-                                    self.clear_user_info()
-                            else:
-                                name = "Noma'lum shaxs!"
-                                self.user_status_label.config(text="Noma'lum shaxs!")
-                                self.clear_user_info()
-                            
-                            # Add new face if unknown
-                            if name == "Noma'lum shaxs!":
-                                face_image = frame[top:bottom, left:right]
-                                face_id = self.face_db.yuz_qoshish(face_image, face_encoding)
-                                
-                                if face_id:
-                                    name = f"ID-{face_id}"
-                                    self.known_face_ids.append(face_id)
-                                    self.known_face_encodings = np.vstack([
-                                        self.known_face_encodings, 
-                                        face_encoding
-                                    ]) if len(self.known_face_encodings) > 0 else np.array([face_encoding])
-                                    self.last_log_times[face_id] = datetime.now()
-                                    # Yangi foydalanuvchi ma'lumotlarini yangilash
-                                    self.update_user_info(face_id)
-                                    self.current_user_id = face_id
-                        
-                        # Draw rectangle and label
-                        cv2.putText(frame, name, (50, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-                else:
-                    # Ko'p yuz topilgan
-                    cv2.putText(frame, f"Ogohlantirish: {face_count} ta yuz aniqlandi!", (50, 50), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-                    self.user_status_label.config(text=f"{face_count} ta yuz aniqlandi!")
-            
-            except Exception as e:
-                print("Xatolik:", e)
-            
-            # Add frame to queue if empty
-            if self.frame_queue.empty():
-                self.frame_queue.put(frame)
-    
     def update_frame(self):
         if not self.running:
             return
-            
-        try:
-            frame = self.frame_queue.get_nowait()
-            
-            # Convert to RGB
-            rgb_image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            
-            # Convert to PIL Image
-            pil_image = Image.fromarray(rgb_image)
-            
-            # Container o'lchamini olish
-            container_width = self.video_container.winfo_width()
-            container_height = self.video_container.winfo_height()
-            
-            # Agar container o'lchamlari mavjud bo'lsa
-            if container_width > 1 and container_height > 1:
-                # Proportional resize
-                img_ratio = pil_image.width / pil_image.height
-                container_ratio = container_width / container_height
-                
-                if container_ratio > img_ratio:
-                    # Container wider than image
-                    new_height = container_height
-                    new_width = int(new_height * img_ratio)
-                else:
-                    # Container taller than image
-                    new_width = container_width
-                    new_height = int(new_width / img_ratio)
-                
-                # Yangi o'lchamlar 0 dan katta bo'lishi kerak
-                if new_width > 0 and new_height > 0:
-                    pil_image = pil_image.resize((new_width, new_height), Image.LANCZOS)
-            
-            # Convert to Tkinter PhotoImage
-            img_tk = ImageTk.PhotoImage(image=pil_image)
-            
-            # Update label
-            self.video_label.imgtk = img_tk
-            self.video_label.config(image=img_tk)
-            
-        except queue.Empty:
-            pass
-            
-        self.root.after(30, self.update_frame)  # 30ms delay for smoother video
+
+        self.handle_events()
+        # Renderer tayyorlagan eng oxirgi rasm (kutmasdan)
+        seq, rasm = self.renderer.slot.get(self.kadr_seq, timeout=0)
+        if rasm is not None:
+            self.kadr_seq = seq
+            if self.photo is None or (self.photo.width(), self.photo.height()) != rasm.size:
+                # Faqat o'lcham o'zgarganda yangi PhotoImage yaratiladi
+                self.photo = ImageTk.PhotoImage(image=rasm)
+                self.video_label.imgtk = self.photo
+                self.video_label.config(image=self.photo)
+            else:
+                self.photo.paste(rasm)
+
+        self.root.after(max(1, int(1000 / self.display_fps)) if self.display_fps > 0 else 30,
+                        self.update_frame)
     
     def update_user_info(self, user_id):
-        user_info = self.face_db.get_user_details(user_id)
+        # Profil keshdan olinadi - tez-tez almashadigan odamlar uchun bazaga so'rov yo'q
+        user_info = self.face_db.get_user_profile(user_id)
             
         if user_info:
             # Rasmni yangilash
-            img_bytes = self.face_db.get_user_image(user_id)
-            if img_bytes:
-                try:
-                    img = Image.open(io.BytesIO(img_bytes))
-                    img.thumbnail((200, 200))
-                    photo = ImageTk.PhotoImage(img)
-                    self.user_image_label.config(image=photo)
-                    self.user_image_label.image = photo
-                except Exception as e:
-                    print("Rasm yuklashda xatolik:", e)
-                    self.show_default_image()
+            if user_info['rasm'] is not None:
+                photo = ImageTk.PhotoImage(user_info['rasm'])
+                self.user_image_label.config(image=photo)
+                self.user_image_label.image = photo
             else:
                 self.show_default_image()
             
@@ -1438,21 +4622,11 @@ class FaceRecognitionApp:
     
     def update_last_entry_time(self, user_id):
         """Oxirgi kirish vaqtini yangilash"""
-        if not self.face_db.ulanish():
-            return None
-        try:
-            with self.face_db.connection.cursor() as cursor:
-                cursor.execute(
-                    "SELECT MAX(entry_time) FROM face_log_data WHERE id_name = %s",
-                    (user_id,)
-                )
-                result = cursor.fetchone()
-                if result and result[0]:
-                    self.user_last_entry_label.config(text=result[0].strftime("%Y-%m-%d %H:%M:%S"))
-                else:
-                    self.user_last_entry_label.config(text="Mavjud emas")
-        except Exception as e:
-            print("Oxirgi kirish vaqtini olishda xatolik:", e)
+        profil = self.face_db.get_user_profile(user_id)
+        oxirgi_kirish = profil['last_entry'] if profil else None
+        if oxirgi_kirish:
+            self.user_last_entry_label.config(text=oxirgi_kirish.strftime("%Y-%m-%d %H:%M:%S"))
+        else:
             self.user_last_entry_label.config(text="Mavjud emas")
     
     def show_default_image(self):
@@ -1474,15 +4648,239 @@ class FaceRecognitionApp:
         self.show_default_image()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Yuzni tanib olish tizimi")
+    parser.add_argument(
+        "--encoding-format",
+        choices=list(FaceDB.KODLASH_FORMATLARI),
+        default="float_array",
+        help="Yuz kodlarini bazada saqlash formati"
+    )
+    parser.add_argument(
+        "--multi-face",
+        action="store_true",
+        help="Kadrdagi barcha yuzlarni tanib olish (guruh bo'lib kirish uchun)"
+    )
+    parser.add_argument(
+        "--no-tracking",
+        action="store_true",
+        help="Yuzlarni treklamasdan har kadrda qayta kodlash"
+    )
+    parser.add_argument(
+        "--camera",
+        action="append",
+        default=None,
+        help="Kamera manbai: qurilma indeksi, video fayl yoki RTSP URL (bir necha marta berish mumkin)"
+    )
+    parser.add_argument(
+        "--backend",
+        choices=["process", "thread"],
+        default="process",
+        help="Aniqlash va kodlash ishchilari: jarayonlar yoki oqimlar puli"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Aniqlash va kodlash uchun ishchilar soni"
+    )
+    parser.add_argument(
+        "--detector",
+        choices=["dlib", "ssd", "cascade"],
+        default="dlib",
+        help="Yuz detektori: dlib, OpenCV SSD yoki SSD filtr + dlib aniqlashtirish"
+    )
+    parser.add_argument(
+        "--ssd-model-dir",
+        default="assets",
+        help="deploy.prototxt va res10_300x300_ssd_iter_140000.caffemodel joylashgan papka"
+    )
+    parser.add_argument(
+        "--ssd-confidence",
+        type=float,
+        default=0.5,
+        help="SSD detektori uchun minimal ishonch"
+    )
+    parser.add_argument(
+        "--motion-gate",
+        action="store_true",
+        help="Harakatsiz sahnalarda aniqlash va kodlashni o'tkazib yuborish"
+    )
+    parser.add_argument(
+        "--motion-threshold",
+        type=float,
+        default=0.01,
+        help="Harakat deb hisoblanadigan o'zgargan piksellar ulushi"
+    )
+    parser.add_argument(
+        "--motion-cooldown",
+        type=float,
+        default=2.0,
+        help="Harakatdan keyin darvoza ochiq turadigan soniyalar"
+    )
+    parser.add_argument(
+        "--orientation",
+        choices=["dlib5", "dlib68", "mediapipe"],
+        default="dlib5",
+        help="Yuz holatini baholash: kodlashdagi dlib nuqtalari yoki MediaPipe FaceMesh"
+    )
+    parser.add_argument(
+        "--enrollment-window",
+        type=float,
+        default=1.0,
+        help="Yangi yuz uchun eng sifatli kadr tanlanadigan oyna (soniya, 0 - darhol yozish)"
+    )
+    parser.add_argument(
+        "--enrollment-strategy",
+        choices=["best", "average"],
+        default="best",
+        help="Eng yaxshi nomzod kodi yoki eng yaxshilarining o'rtacha kodi"
+    )
+    parser.add_argument(
+        "--display-fps",
+        type=int,
+        default=30,
+        help="Ekranga chiqarish tezligi chegarasi (tanish tezligidan alohida)"
+    )
+    parser.add_argument(
+        "--search-mode",
+        choices=GalleryIndex.QIDIRUV_REJIMLARI,
+        default="exact",
+        help="Galereyada qidiruv: exact (to'liq), ivf/hnsw (taqribiy) yoki auto (katta galereyada taqribiy)"
+    )
+    parser.add_argument(
+        "--nprobe",
+        type=int,
+        default=8,
+        help="IVF qidiruvda tekshiriladigan ro'yxatlar soni (katta - aniqroq, sekinroq)"
+    )
+    parser.add_argument(
+        "--ef-search",
+        type=int,
+        default=64,
+        help="HNSW qidiruvdagi nomzodlar soni (katta - aniqroq, sekinroq)"
+    )
+    parser.add_argument(
+        "--latency-target",
+        type=float,
+        default=0.3,
+        help="Tanish kechikishi maqsadi (soniya); oshsa har N-kadr tanishga yuboriladi"
+    )
+    parser.add_argument(
+        "--cpu-budget",
+        type=float,
+        default=1.0,
+        help="Tanish uchun ishchilar quvvatidan ajratilgan ulush (0..1)"
+    )
+    parser.add_argument(
+        "--max-stride",
+        type=int,
+        default=30,
+        help="Tanish qadamining yuqori chegarasi (har N-kadr)"
+    )
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="Ekransiz ishlash: hodisalar stdout ga JSON qatorlar bo'lib yoziladi"
+    )
+    parser.add_argument(
+        "--enroll",
+        metavar="YOL",
+        help="Rasmlar papkasi yoki video fayldagi yangi yuzlarni bazaga qo'shib, chiqish"
+    )
+    parser.add_argument(
+        "--recognize",
+        metavar="YOL",
+        help="Rasmlar papkasi yoki video fayldagi yuzlarni tanib, natijalarni faylga yozib, chiqish"
+    )
+    parser.add_argument(
+        "--results",
+        default=None,
+        help="Oflayn ishlov natijalari yoziladigan CSV fayl"
+    )
+    parser.add_argument(
+        "--sample-every",
+        type=int,
+        default=5,
+        help="Videoda har nechanchi kadr ishlanadi"
+    )
+    parser.add_argument(
+        "--log-partitioning",
+        action="store_true",
+        help="face_log_data ni oylik bo'limlarga ajratish (mavjud jadval birinchi bo'lim bo'ladi)"
+    )
+    parser.add_argument(
+        "--log-retention-months",
+        type=int,
+        default=None,
+        help="Shuncha oydan eski log bo'limlarini o'chirish (--log-partitioning bilan)"
+    )
+    parser.add_argument(
+        "--log-archive-dir",
+        default=None,
+        help="O'chiriladigan log bo'limlari shu papkaga gzip CSV qilib yoziladi"
+    )
+    parser.add_argument(
+        "--migrate-encodings",
+        action="store_true",
+        help="Mavjud FLOAT[128] kodlarni --encoding-format ga ko'chirib, chiqish"
+    )
+    parser.add_argument(
+        "--drop-old-encoding",
+        action="store_true",
+        help="Ko'chirishdan keyin eski FLOAT[128] ustunini o'chirish"
+    )
+    args = parser.parse_args()
+
     # Create assets directory if not exists
     if not os.path.exists('assets'):
         os.makedirs('assets')
 
     # Initialize database
-    face_db = FaceDB("face_db", "postgres", "123", "localhost", "5432")
+    face_db = FaceDB("face_db", "postgres", "123", "localhost", "5432",
+                     kodlash_formati=args.encoding_format,
+                     log_bolimlash=args.log_partitioning,
+                     log_saqlash_oylari=args.log_retention_months,
+                     arxiv_papkasi=args.log_archive_dir)
     face_db.jadvallarni_yaratish()
-    
+
+    if args.migrate_encodings:
+        soni = face_db.kodlashlarni_kochirish(eski_ustunni_ochirish=args.drop_old_encoding)
+        print(f"Jami {soni} ta kod ko'chirildi.")
+        face_db.ulanishni_yopish()
+        sys.exit(0)
+
+    if args.enroll or args.recognize:
+        ishlovchi = BatchProcessor(face_db, workers=args.workers, qadam=args.sample_every)
+        if args.enroll:
+            ishlovchi.enroll(args.enroll, args.results)
+        else:
+            ishlovchi.recognize(args.recognize, args.results or "batch_results.csv")
+        face_db.ulanishni_yopish()
+        sys.exit(1 if ishlovchi.xatolar else 0)
+
+    if not args.headless and tk is None:
+        print("Oynali rejim uchun tkinter, ttkbootstrap va Pillow (ImageTk) kerak; --headless bilan ishga tushiring")
+        face_db.ulanishni_yopish()
+        sys.exit(1)
+
+    engine = RecognitionEngine(face_db, cameras=args.camera, multi_face=args.multi_face,
+                               tracking=not args.no_tracking, backend=args.backend,
+                               workers=args.workers, kadrlarni_uzatish=not args.headless,
+                               detector=args.detector, ssd_papka=args.ssd_model_dir,
+                               ssd_ishonch=args.ssd_confidence, motion_gate=args.motion_gate,
+                               harakat_chegarasi=args.motion_threshold,
+                               harakat_sovishi=args.motion_cooldown,
+                               orientation=args.orientation,
+                               enroll_oyna=args.enrollment_window,
+                               enroll_usul=args.enrollment_strategy,
+                               maqsad_kechikish=args.latency_target,
+                               cpu_byudjeti=args.cpu_budget, max_qadam=args.max_stride,
+                               search_mode=args.search_mode, nprobe=args.nprobe,
+                               ef_search=args.ef_search)
+    if args.headless:
+        sys.exit(run_headless(engine))
+
     # Create and run app
     root = tk.Tk()
-    app = FaceRecognitionApp(root)
+    app = FaceRecognitionApp(root, engine=engine, display_fps=args.display_fps)
     root.mainloop()
\ No newline at end of file